@@ -0,0 +1,201 @@
+import argparse
+import sys
+
+import numpy as np
+
+import degrees
+
+# Distance recorded for people the source cannot reach
+UNREACHABLE = -1
+
+
+def csr(offsets, indices, added, rows):
+    """
+    Returns (offsets, indices) NumPy arrays for `rows` rows of CSR
+    adjacency, merging the `added` dict of extra indices per row.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    indices = np.asarray(indices, dtype=np.int32)
+    if not added and len(offsets) == rows + 1:
+        return offsets, indices
+
+    # Append the extra links as (row, index) pairs and regroup them by row
+    counts = np.zeros(rows, dtype=np.int64)
+    counts[:len(offsets) - 1] = np.diff(offsets)
+    extra_rows = np.array([row for row, extra in added.items() for _ in extra], dtype=np.int64)
+    extra = np.array([index for extra in added.values() for index in extra], dtype=np.int32)
+    row_of = np.concatenate([np.repeat(np.arange(rows), counts), extra_rows])
+    order = np.argsort(row_of, kind="stable")
+    offsets = np.zeros(rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(row_of, minlength=rows), out=offsets[1:])
+    return offsets, np.concatenate([indices, extra])[order]
+
+
+def gather(offsets, indices, rows):
+    """
+    Returns (sources, targets) for every edge leaving `rows`.
+    """
+    starts = offsets[rows]
+    counts = offsets[rows + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+
+    # Index of each edge: its row's start plus its position within the row
+    shift = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return np.repeat(rows, counts), indices[shift + np.arange(total)]
+
+
+class ArrayGraph():
+    """
+    NumPy copy of a CoStarGraph's CSR adjacency for whole-graph traversals.
+
+    Both sides keep the row of every edge as well, so a bottom-up step
+    can scan all edges at once.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.people = graph.person_count()
+        self.movies = graph.movie_count()
+        self.person_offsets, self.person_movies = csr(
+            graph.person_offsets, graph.person_movies, graph.added_movies, self.people
+        )
+        self.movie_offsets, self.movie_people = csr(
+            graph.movie_offsets, graph.movie_people, graph.added_stars, self.movies
+        )
+        self.movie_rows = np.repeat(
+            np.arange(self.movies, dtype=np.int32), np.diff(self.movie_offsets)
+        )
+        self.person_rows = np.repeat(
+            np.arange(self.people, dtype=np.int32), np.diff(self.person_offsets)
+        )
+        self.person_degrees = np.diff(self.person_offsets)
+        self.movie_degrees = np.diff(self.movie_offsets)
+
+    def step(self, frontier, visited, side, alpha):
+        """
+        Returns the newly reached rows on the other side of the graph
+        and, for each, a row of `frontier` that reached it.
+
+        Expands top-down from the frontier while its edges are few, and
+        otherwise bottom-up, checking every edge into an unvisited row
+        against a bitmap of the frontier.
+        """
+        if side == "people":
+            offsets, indices, counts = self.person_offsets, self.person_movies, self.person_degrees
+            rows, reverse, size = self.movie_rows, self.movie_people, self.people
+        else:
+            offsets, indices, counts = self.movie_offsets, self.movie_people, self.movie_degrees
+            rows, reverse, size = self.person_rows, self.person_movies, self.movies
+
+        if int(counts[frontier].sum()) * alpha < len(reverse):
+            sources, targets = gather(offsets, indices, frontier)
+            fresh = ~visited[targets]
+            sources, targets = sources[fresh], targets[fresh]
+        else:
+            bitmap = np.zeros(size, dtype=bool)
+            bitmap[frontier] = True
+            hits = np.flatnonzero(bitmap[reverse] & ~visited[rows])
+            sources, targets = reverse[hits], rows[hits]
+
+        # Keep the first source found for each target
+        targets, first = np.unique(targets, return_index=True)
+        return targets, sources[first]
+
+    def bfs(self, source, alpha=8):
+        """
+        Returns (distance, parent, movie) arrays for a level-synchronous
+        BFS from person index `source`.
+
+        `distance[p]` is the number of movies separating `p` from the
+        source, or UNREACHABLE, and `p` starred in `movie[p]` with
+        `parent[p]`, one step closer to the source. A frontier step goes
+        bottom-up once the frontier's edges times `alpha` exceed the
+        edge count.
+        """
+        distance = np.full(self.people, UNREACHABLE, dtype=np.int32)
+        parent = np.full(self.people, -1, dtype=np.int32)
+        movie = np.full(self.people, -1, dtype=np.int32)
+        seen_people = np.zeros(self.people, dtype=bool)
+        seen_movies = np.zeros(self.movies, dtype=bool)
+        via = np.empty(self.movies, dtype=np.int32)
+
+        distance[source] = 0
+        seen_people[source] = True
+        frontier = np.array([source], dtype=np.int64)
+        depth = 0
+        while len(frontier):
+            depth += 1
+
+            # Movies reached from the frontier, then their unvisited casts
+            movies, starred = self.step(frontier, seen_movies, "people", alpha)
+            seen_movies[movies] = True
+            via[movies] = starred
+            frontier, through = self.step(movies, seen_people, "movies", alpha)
+            seen_people[frontier] = True
+            distance[frontier] = depth
+            movie[frontier] = through
+            parent[frontier] = via[through]
+        return distance, parent, movie
+
+
+def bacon_numbers(graph, source, alpha=8):
+    """
+    Returns (distance, parent, movie) arrays over every person in
+    `graph` from the person with IMDB id `source`; see ArrayGraph.bfs.
+    """
+    return ArrayGraph(graph).bfs(graph.person_index(source), alpha)
+
+
+def path_to(graph, distance, parent, movie, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs from the
+    BFS source to the person with IMDB id `target`, or None if the
+    source does not reach them.
+    """
+    person = graph.person_index(target)
+    if person is None or distance[person] == UNREACHABLE:
+        return None
+    path = []
+    while distance[person] > 0:
+        path.append((graph.movie_ids[movie[person]], graph.person_ids[person]))
+        person = parent[person]
+    path.reverse()
+    return path
+
+
+def histogram(distance):
+    """
+    Returns {degrees: count of people} for the reachable people in
+    `distance`, plus the number of unreachable people.
+    """
+    reached = distance[distance != UNREACHABLE]
+    counts = np.bincount(reached)
+    return {depth: int(count) for depth, count in enumerate(counts)}, len(distance) - len(reached)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Degrees of separation from one person to everyone.")
+    parser.add_argument("directory")
+    parser.add_argument("name", help="name or IMDB id of the source person")
+    parser.add_argument("--alpha", type=int, default=8,
+                        help="go bottom-up once frontier edges times ALPHA exceed all edges")
+    args = parser.parse_args()
+
+    degrees.load_data(args.directory, backend="compact")
+    try:
+        source = degrees.resolve_person(args.name)
+    except ValueError as error:
+        sys.exit(str(error))
+
+    distance, _, _ = bacon_numbers(degrees.graph, source, args.alpha)
+    counts, unreachable = histogram(distance)
+    for depth, count in counts.items():
+        print(f"{depth}: {count}")
+    print(f"unreachable: {unreachable}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+
+import degrees
+
+
+def read_queries(path):
+    """
+    Yields (source, target) pairs from a CSV file with `source` and
+    `target` columns, or from a JSONL file of objects with those keys.
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    query = json.loads(line)
+                    yield query["source"], query["target"]
+        else:
+            for row in csv.DictReader(f):
+                yield row["source"], row["target"]
+
+
+def answer(query):
+    """
+    Returns the JSON-ready result for one numbered (source, target) query.
+    """
+    index, (source, target) = query
+    result = {"index": index, "source": source, "target": target}
+    try:
+        path = degrees.shortest_path(
+            degrees.resolve_person(source),
+            degrees.resolve_person(target),
+            bidirectional=True
+        )
+    except ValueError as error:
+        result["error"] = str(error)
+        return result
+    result["degrees"] = None if path is None else len(path)
+    result["path"] = path
+    return result
+
+
+def run_batch(directory, queries, output, backend="compact", workers=None):
+    """
+    Answers every (source, target) pair in `queries`, writing one JSON
+    line per result to `output` as soon as it completes.
+
+    The dataset is loaded once in this process. Workers are forked from
+    it so they share the loaded graph copy-on-write instead of receiving
+    a pickled copy; where fork is unavailable each worker loads it.
+    """
+    degrees.load_data(directory, backend=backend)
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+        initializer, initargs = None, ()
+    else:
+        context = multiprocessing.get_context("spawn")
+        initializer, initargs = degrees.load_data, (directory, backend)
+
+    with context.Pool(workers, initializer=initializer, initargs=initargs) as pool:
+        for result in pool.imap_unordered(answer, enumerate(queries), chunksize=64):
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer degrees queries in bulk.")
+    parser.add_argument("directory")
+    parser.add_argument("queries", help="CSV or JSONL file of source/target pairs")
+    parser.add_argument("--output", help="JSONL file for results (default: stdout)")
+    parser.add_argument("--backend", choices=["dict", "compact", "sqlite"], default="compact")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    queries = read_queries(args.queries)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            run_batch(args.directory, queries, output, args.backend, args.workers)
+    else:
+        run_batch(args.directory, queries, sys.stdout, args.backend, args.workers)
+
+
+if __name__ == "__main__":
+    main()
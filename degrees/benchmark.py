@@ -0,0 +1,190 @@
+import argparse
+import random
+import resource
+import statistics
+import sys
+import time
+
+import degrees
+from util import Node, QueueFrontier, DequeQueueFrontier
+
+
+def benchmark_frontier(frontier_class, n, probes=1000):
+    """
+    Returns seconds spent adding `n` nodes to a fresh frontier,
+    checking `probes` states for membership and removing every node.
+    """
+    frontier = frontier_class()
+    timings = {}
+
+    start = time.perf_counter()
+    for state in range(n):
+        frontier.add(Node(state=state, parent=None, action=None))
+    timings["add"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    step = max(n // probes, 1)
+    for state in range(0, n, step):
+        frontier.contains_state(state)
+    timings["contains_state"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    while not frontier.empty():
+        frontier.remove()
+    timings["remove"] = time.perf_counter() - start
+
+    return timings
+
+
+def peak_rss():
+    """
+    Returns the peak resident set size of this process in megabytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def count_expansions():
+    """
+    Wraps the adjacency lookup of the loaded backend so every person
+    expanded by a search is counted. Returns the list holding the count.
+    """
+    expanded = [0]
+    if degrees.graph is not None:
+        movies_for = degrees.graph.movies_for
+
+        def counting(person):
+            expanded[0] += 1
+            return movies_for(person)
+        degrees.graph.movies_for = counting
+    else:
+        neighbors_for_person = degrees.neighbors_for_person
+
+        def counting(person_id):
+            expanded[0] += 1
+            return neighbors_for_person(person_id)
+        degrees.neighbors_for_person = counting
+    return expanded
+
+
+def cast_members():
+    """
+    Returns the sorted person_ids of everyone in the loaded dataset
+    who starred in at least one movie.
+    """
+    if degrees.graph is not None:
+        graph = degrees.graph
+        return sorted(graph.person_ids[person] for person in range(graph.person_count())
+                      if len(graph.movies_for(person)))
+    if degrees.store is not None:
+        return [person_id for (person_id,) in degrees.store.query(
+            "SELECT DISTINCT person_id FROM stars ORDER BY person_id"
+        )]
+    return sorted(person_id for person_id, person in degrees.people.items() if person["movies"])
+
+
+def percentile(values, p):
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1] if len(values) > 1 else values[0]
+
+
+def benchmark_degrees(directory, backend, queries, modes, seed=0, neighbor_cache=0):
+    """
+    Loads `directory` with `backend`, runs `queries` random pairs of
+    people who starred in a movie through each search mode and returns
+    the measurements, split between connected and disconnected pairs.
+    """
+    start = time.perf_counter()
+    degrees.load_data(directory, backend=backend)
+    degrees.cache_neighbors(neighbor_cache)
+    results = {"load": time.perf_counter() - start, "rss": peak_rss(), "modes": {}}
+
+    # People without movies are trivially disconnected and would skew the results
+    rng = random.Random(seed)
+    person_ids = cast_members()
+    if not person_ids:
+        raise ValueError("no one in the dataset starred in a movie")
+    pairs = [(rng.choice(person_ids), rng.choice(person_ids)) for _ in range(queries)]
+
+    expanded = count_expansions()
+    for mode in modes:
+        outcomes = {"connected": ([], []), "disconnected": ([], [])}
+        for source, target in pairs:
+            expanded[0] = 0
+            start = time.perf_counter()
+            path = degrees.shortest_path(source, target, bidirectional=(mode == "bidirectional"))
+            latency = time.perf_counter() - start
+            latencies, expansions = outcomes["disconnected" if path is None else "connected"]
+            latencies.append(latency)
+            expansions.append(expanded[0])
+        results["modes"][mode] = {
+            outcome: {
+                "queries": len(latencies),
+                "expanded": statistics.mean(expansions),
+                "p50": percentile(latencies, 50),
+                "p90": percentile(latencies, 90),
+                "p99": percentile(latencies, 99),
+            }
+            for outcome, (latencies, expansions) in outcomes.items() if latencies
+        }
+    results["rss"] = peak_rss()
+    if degrees.neighbor_cache is not None:
+        results["neighbor_cache"] = degrees.neighbor_cache.stats()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for degrees.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    frontier = subparsers.add_parser("frontier", help="frontier micro-benchmark")
+    frontier.add_argument("--nodes", type=int, default=10 ** 6,
+                          help="frontier size for the deque-backed frontier")
+    frontier.add_argument("--legacy-nodes", type=int, default=2 * 10 ** 4,
+                          help="frontier size for the list-backed frontier, which is quadratic")
+
+    search = subparsers.add_parser("search", help="load and query a dataset")
+    search.add_argument("directory", help="dataset, e.g. one written by synthetic.py")
+    search.add_argument("--backend", choices=["dict", "compact", "sqlite"], default="compact")
+    search.add_argument("--queries", type=int, default=100)
+    search.add_argument("--modes", nargs="+", choices=["bfs", "bidirectional"],
+                        default=["bidirectional"])
+    search.add_argument("--seed", type=int, default=0)
+    search.add_argument("--neighbor-cache", type=int, default=0, metavar="MB",
+                        help="memory budget for cached co-star sets (dict and sqlite backends)")
+    args = parser.parse_args()
+    if args.command == "search" and args.neighbor_cache and args.backend == "compact":
+        parser.error("--neighbor-cache only applies to the dict and sqlite backends")
+
+    if args.command == "frontier":
+        for frontier_class, n in [
+            (QueueFrontier, args.legacy_nodes),
+            (DequeQueueFrontier, args.nodes),
+        ]:
+            timings = benchmark_frontier(frontier_class, n)
+            print(f"{frontier_class.__name__} (n = {n})")
+            for operation, seconds in timings.items():
+                print(f"  {operation}: {seconds:.4f}s")
+        return
+
+    # Run one backend per process so peak RSS is not shared between them
+    results = benchmark_degrees(args.directory, args.backend, args.queries, args.modes,
+                                args.seed, args.neighbor_cache * 1024 * 1024)
+    print(f"{args.directory} ({args.backend} backend)")
+    print(f"  load: {results['load']:.3f}s")
+    print(f"  peak RSS: {results['rss']:.1f} MB")
+    for mode, outcomes in results["modes"].items():
+        for outcome, stats in outcomes.items():
+            print(f"  {mode}, {stats['queries']} {outcome}: "
+                  f"{stats['expanded']:.0f} people expanded per query, "
+                  f"p50 {stats['p50'] * 1000:.2f}ms, p90 {stats['p90'] * 1000:.2f}ms, "
+                  f"p99 {stats['p99'] * 1000:.2f}ms")
+    if "neighbor_cache" in results:
+        stats = results["neighbor_cache"]
+        print(f"  neighbor cache: {stats['hits']} hits, {stats['misses']} misses, "
+              f"{stats['size']} people in {stats['weight'] / (1024 * 1024):.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import http.client
+import json
+import socket
+from urllib.parse import urlencode, urlparse
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    HTTP connection over a Unix domain socket.
+    """
+
+    def __init__(self, path):
+        super().__init__("localhost")
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+class DegreesClient():
+    """
+    Minimal client for a running degrees server, addressed either by
+    an http:// URL or by a Unix socket path.
+    """
+
+    def __init__(self, address):
+        self.address = address
+
+    def connection(self):
+        if self.address.startswith("http://"):
+            url = urlparse(self.address)
+            return http.client.HTTPConnection(url.hostname, url.port or 80)
+        return UnixHTTPConnection(self.address)
+
+    def get(self, path, **params):
+        """
+        Returns the decoded JSON response to a GET request.
+        """
+        connection = self.connection()
+        try:
+            connection.request("GET", f"{path}?{urlencode(params)}")
+            return json.loads(connection.getresponse().read())
+        finally:
+            connection.close()
+
+    def shortest_path(self, source, target):
+        return self.get("/path", source=source, target=target)
+
+    def names(self, query, limit=10):
+        return self.get("/names", q=query, limit=limit)
+
+    def stats(self):
+        return self.get("/stats")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a degrees server.")
+    parser.add_argument("address", help="http://host:port or a Unix socket path")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    path = subparsers.add_parser("path")
+    path.add_argument("source")
+    path.add_argument("target")
+    names = subparsers.add_parser("names")
+    names.add_argument("query")
+    subparsers.add_parser("stats")
+    args = parser.parse_args()
+
+    client = DegreesClient(args.address)
+    if args.command == "path":
+        response = client.shortest_path(args.source, args.target)
+    elif args.command == "names":
+        response = client.names(args.query)
+    else:
+        response = client.stats()
+    print(json.dumps(response, indent=2))
+
+
+if __name__ == "__main__":
+    main()
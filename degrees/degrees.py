@@ -1,7 +1,15 @@
+import argparse
 import csv
 import sys
+import threading
+from datetime import date
 
-from util import Node, StackFrontier, QueueFrontier
+from graph import CoStarGraph, MoviesView, NamesView, PeopleView
+from landmarks import load_landmarks
+from nameindex import NameIndex
+from snapshot import append_journal, apply_row, load_graph, read_delta, read_journal, replay_journal
+from store import MoviesTable, NamesTable, PeopleTable, load_store
+from util import Node, DequeQueueFrontier, LRUCache, PriorityFrontier
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,49 +20,73 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
-class Node():
-    def __init__(self, state, parent, action):
-        self.state = state
-        self.parent = parent
-        self.action = action
+# Compact CSR co-star graph, set when loaded with the "compact" backend
+graph = None
 
+# Lazily queried SQLite dataset, set when loaded with the "sqlite" backend
+store = None
 
-class StackFrontier():
-    def __init__(self):
-        self.frontier = []
+# Landmark distance oracle over `graph`, set by load_landmarks
+oracle = None
 
-    def add(self, node):
-        self.frontier.append(node)
+# Prefix and fuzzy index over the keys of `names`
+name_index = None
 
-    def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+# Co-star sets from neighbors_for_person, set by cache_neighbors; the
+# dict and sqlite backends are the only ones whose searches use it
+neighbor_cache = None
+neighbor_lock = threading.Lock()
 
-    def empty(self):
-        return len(self.frontier) == 0
+# Sets of movie_ids by release year for the dict backend, built by year_index
+movie_years = None
 
-    def remove(self):
-        if self.empty():
-            raise Exception("empty frontier")
-        else:
-            node = self.frontier[-1]
-            self.frontier = self.frontier[:-1]
-            return node
+# Years of recently costed movies in the compact backend, keyed by movie_id
+year_cache = LRUCache(65536)
 
+def load_data(directory, backend="dict", snapshot=True):
+    """
+    Load data from CSV files into memory.
 
-class QueueFrontier(StackFrontier):
+    The "dict" backend fills `names`, `people` and `movies` with plain
+    dicts. The "compact" backend builds an integer-indexed CSR graph and
+    replaces them with read-only views over it; with `snapshot`, the graph
+    is memory-mapped from a binary snapshot that is rebuilt whenever the
+    CSV files change. The "sqlite" backend imports the CSV files once into
+    an indexed SQLite file and fetches rows only as queries need them.
+
+    Every backend also merges the rows recorded in the dataset's journal.
+    """
+    global graph, store, oracle, names, people, movies, name_index, movie_years
 
-    def remove(self):
-        if self.empty():
-            raise Exception("empty frontier")
+    # Drop whatever an earlier load left behind, whichever backend it used
+    graph = store = oracle = name_index = movie_years = None
+    names, people, movies = {}, {}, {}
+    year_cache.clear()
+    clear_neighbors()
+
+    if backend == "compact":
+        if snapshot:
+            graph = load_graph(directory)
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
-            return node
+            graph = CoStarGraph.from_csv(directory)
+            replay_journal(graph, directory)
+        names = NamesView(graph)
+        people = PeopleView(graph)
+        movies = MoviesView(graph)
+        name_index = NameIndex(names)
+        return
+    elif backend == "sqlite":
+        store = load_store(directory)
+        names = NamesTable(store)
+        people = PeopleTable(store)
+        movies = MoviesTable(store)
+
+        # Built on first use, since it holds every name in memory
+        name_index = None
+        return
+    elif backend != "dict":
+        raise ValueError(f"unknown backend: {backend}")
 
-def load_data(directory):
-    """
-    Load data from CSV files into memory.
-    """
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -88,26 +120,153 @@ def load_data(directory):
                 movies[row["movie_id"]]["stars"].add(row["person_id"])
             except KeyError:
                 pass
+    merge_rows(read_journal(directory))
+
+    name_index = NameIndex(names)
+    year_index()
+
+
+def append_data(directory, journal=None):
+    """
+    Merge delta CSV files of new people, movies and stars from `directory`
+    into the loaded data, in time proportional to the delta. Any of the
+    three files may be missing, and rows already loaded are skipped.
+
+    With the compact and sqlite backends, `journal` names the dataset
+    directory whose snapshot journal should also record the delta for
+    later loads.
+
+    Returns the rows read from `directory`.
+    """
+    global oracle
+
+    rows = list(read_delta(directory))
+    clear_neighbors()
+    if name_index is not None:
+        for kind, *fields in rows:
+            if kind == "person":
+                name_index.add(fields[1].lower())
+
+    if store is not None:
+        store.append(rows)
+        if journal is not None:
+            append_journal(journal, rows)
+        return rows
+
+    if graph is not None:
+        for row in rows:
+            apply_row(graph, row)
+        if journal is not None:
+            append_journal(journal, rows)
+
+        # New links can shorten distances, so landmark bounds no longer hold
+        oracle = None
+        return rows
+
+    merge_rows(rows)
+    return rows
+
+
+def use_landmarks(directory, count, appended=None):
+    """
+    Prune unconstrained searches with `count` landmarks over the compact
+    graph loaded from `directory`; see landmarks.load_landmarks for
+    `appended`.
+    """
+    global oracle
+    if graph is None:
+        raise ValueError("landmarks require the compact backend")
+    oracle = load_landmarks(graph, directory, count, appended)
+
+
+def merge_rows(rows):
+    """
+    Merge delta rows from read_delta into the dicts of the "dict" backend.
+    """
+    for kind, *fields in rows:
+        if kind == "person":
+            person_id, name, birth = fields
+            if person_id in people:
+                continue
+            people[person_id] = {
+                "name": name,
+                "birth": birth,
+                "movies": set()
+            }
+            names.setdefault(name.lower(), set()).add(person_id)
+        elif kind == "movie":
+            movie_id, title, year = fields
+            if movie_id in movies:
+                continue
+            movies[movie_id] = {
+                "title": title,
+                "year": year,
+                "stars": set()
+            }
+            if movie_years is not None:
+                add_movie_year(movie_id, year)
+        elif kind == "star":
+            person_id, movie_id = fields
+            if person_id in people and movie_id in movies:
+                people[person_id]["movies"].add(movie_id)
+                movies[movie_id]["stars"].add(person_id)
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(description="Degrees of separation between actors.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--backend", choices=["dict", "compact", "sqlite"], default="dict",
+                        help="in-memory representation of the dataset")
+    parser.add_argument("--no-snapshot", dest="snapshot", action="store_false",
+                        help="always parse the CSV files with the compact backend")
+    parser.add_argument("--landmarks", type=int, metavar="COUNT",
+                        help="prune searches with COUNT precomputed landmarks (compact backend)")
+    parser.add_argument("--append", metavar="DELTA",
+                        help="merge new people, movies and stars CSVs from DELTA")
+    parser.add_argument("--neighbor-cache", type=int, default=0, metavar="MB",
+                        help="memory budget for cached co-star sets (dict and sqlite backends)")
+    parser.add_argument("--years", type=int, nargs=2, metavar=("FIRST", "LAST"),
+                        help="only connect people through movies from these years")
+    parser.add_argument("--allow", nargs="+", metavar="MOVIE_ID",
+                        help="only connect people through these movies")
+    parser.add_argument("--deny", nargs="+", metavar="MOVIE_ID",
+                        help="never connect people through these movies")
+    parser.add_argument("--cost", choices=sorted(COSTS),
+                        help="find the cheapest connection under this cost instead of the shortest")
+    args = parser.parse_args()
+    if args.neighbor_cache and args.backend == "compact":
+        parser.error("--neighbor-cache only applies to the dict and sqlite backends")
+    cache_neighbors(args.neighbor_cache * 1024 * 1024)
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(args.directory, backend=args.backend, snapshot=args.snapshot)
+    if args.append:
+        # Persist the delta alongside the snapshot so later runs include it
+        journal = args.directory if store is not None or graph is not None and args.snapshot else None
+        appended = append_data(args.append, journal=journal)
+    if args.landmarks:
+        if graph is None:
+            sys.exit("Landmarks require the compact backend.")
+        # Rows left out of the journal change the graph but not its sources
+        use_landmarks(args.directory, args.landmarks,
+                      appended if args.append and journal is None else None)
     print("Data loaded.")
 
-    source = person_id_for_name(input("Name: "))
+    source = person_id_for_name(name := input("Name: "))
     if source is None:
-        sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
+        sys.exit(not_found(name))
+    target = person_id_for_name(name := input("Name: "))
     if target is None:
-        sys.exit("Person not found.")
+        sys.exit(not_found(name))
 
-    path = shortest_path(source, target)
+    if args.cost:
+        # Every cost in COSTS is at least 1 per movie
+        path = astar(source, target, COSTS[args.cost], min_cost=1,
+                     years=args.years, allow=args.allow, deny=args.deny)
+    else:
+        path = shortest_path(source, target, bidirectional=True,
+                             years=args.years, allow=args.allow, deny=args.deny)
 
     if path is None:
         print("Not connected.")
@@ -122,16 +281,33 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, bidirectional=False, years=None, allow=None, deny=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
+    If `bidirectional` is true, searches from both ends at once.
+
+    Only movies released in the inclusive (first, last) `years` range,
+    among the `allow` movie_ids if given and not among the `deny`
+    movie_ids, are used to connect people.
+
     If no possible path, returns None.
     """
+    constrained = years is not None or allow is not None or deny is not None
+
+    # Landmark bounds hold for the whole graph, not for a subset of its movies
+    if oracle is not None and not constrained:
+        return oracle.shortest_path(source, target)
+    if graph is not None:
+        blocked = graph.blocked_movies(years, allow, deny) if constrained else None
+        return graph.shortest_path(source, target, bidirectional, blocked)
+    usable = movie_filter(years, allow, deny) if constrained else None
+    if bidirectional:
+        return bidirectional_search(source, target, usable)
 
     # Initializes the frontier for BFS
-    frontier = QueueFrontier()
+    frontier = DequeQueueFrontier()
     start_node = Node(state=source, parent=None, action=None)
     frontier.add(start_node)
 
@@ -158,6 +334,10 @@ def shortest_path(source, target):
             # Get neighbors for the node
             neighbors = neighbors_for_person(state)
             for action, neighbor_state in neighbors:
+                if neighbor_state in visited or frontier.contains_state(neighbor_state):
+                    continue
+                if usable is not None and not usable(action):
+                    continue
                 # Create a new node for the neighbor and add it to the frontier
                 new_node = Node(state=neighbor_state, parent=node, action=action)
                 frontier.add(new_node)
@@ -166,6 +346,240 @@ def shortest_path(source, target):
     return None
 
 
+def bidirectional_search(source, target, usable=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, growing one BFS frontier
+    from each end and always expanding the smaller of the two.
+
+    If `usable` is given, only movies for which it returns true are used.
+
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+
+    # Map each reached person to the (movie_id, person_id) step that reached it
+    forward = {source: None}
+    backward = {target: None}
+    forward_layer = [source]
+    backward_layer = [target]
+
+    def expand(layer, parents, others):
+        """
+        Expands a whole BFS layer, returning the next layer and the
+        person where both searches met (or None).
+        """
+        next_layer = []
+        for state in layer:
+            for action, neighbor in neighbors_for_person(state):
+                if neighbor in parents:
+                    continue
+                if usable is not None and not usable(action):
+                    continue
+                parents[neighbor] = (action, state)
+                # The two searches are disjoint until they meet, so the
+                # first shared person closes a shortest path
+                if neighbor in others:
+                    return next_layer, neighbor
+                next_layer.append(neighbor)
+        return next_layer, None
+
+    while forward_layer and backward_layer:
+        if len(forward_layer) <= len(backward_layer):
+            forward_layer, meeting = expand(forward_layer, forward, backward)
+        else:
+            backward_layer, meeting = expand(backward_layer, backward, forward)
+        if meeting is None:
+            continue
+
+        # Walk back from the meeting person to the source
+        path = []
+        state = meeting
+        while forward[state] is not None:
+            action, parent = forward[state]
+            path.append((action, state))
+            state = parent
+        path.reverse()
+
+        # Walk forward from the meeting person to the target
+        state = meeting
+        while backward[state] is not None:
+            action, state = backward[state]
+            path.append((action, state))
+        return path
+
+    return None
+
+
+def dijkstra(source, target, cost=None):
+    """
+    Returns the list of (movie_id, person_id) pairs that connects the
+    source to the target with the lowest total cost, or None.
+
+    `cost(movie_id, person_id)` is the non-negative cost of reaching
+    person_id through movie_id, 1 by default.
+    """
+    return astar(source, target, cost)
+
+
+def astar(source, target, cost=None, heuristic=None, min_cost=None, years=None, allow=None, deny=None):
+    """
+    Returns the list of (movie_id, person_id) pairs that connects the
+    source to the target with the lowest total cost, or None.
+
+    `heuristic(person_id)` must never overestimate the remaining cost
+    to the target; without one this is Dijkstra's algorithm. With
+    landmarks loaded, passing the lowest possible cost of one movie as
+    `min_cost` uses the landmark lower bounds as the heuristic instead.
+
+    `years`, `allow` and `deny` restrict the movies used as in
+    shortest_path.
+    """
+    if cost is None:
+        cost = unit_cost
+    constrained = years is not None or allow is not None or deny is not None
+    if graph is not None:
+        blocked = graph.blocked_movies(years, allow, deny) if constrained else None
+        if heuristic is not None:
+            person_ids = graph.person_ids
+            return graph.cheapest_path(
+                source, target, cost, lambda person: heuristic(person_ids[person]), blocked
+            )
+        goal = graph.person_index(target)
+
+        # Leaving movies out only lengthens paths, so landmark bounds still hold
+        if min_cost is not None and oracle is not None and goal is not None:
+            return graph.cheapest_path(source, target, cost, oracle.heuristic(goal, min_cost), blocked)
+        return graph.cheapest_path(source, target, cost, blocked=blocked)
+    usable = movie_filter(years, allow, deny) if constrained else None
+
+    frontier = PriorityFrontier()
+    frontier.add(Node(state=source, parent=None, action=None), 0)
+    explored = set()
+
+    # The node each movie's cast was last reached from. Costs depend only
+    # on the movie and the person reached, so reaching the same cast again
+    # from a node that cost as much or more cannot improve on it.
+    relaxed = {}
+
+    while not frontier.empty():
+        node = frontier.remove()
+        if node.state == target:
+            path = []
+            while node.parent is not None:
+                path.append((node.action, node.state))
+                node = node.parent
+            path.reverse()
+            return path
+
+        # Nodes leave the frontier cheapest first, so this cost is final
+        explored.add(node.state)
+        for action, neighbor in neighbors_for_person(node.state):
+            if neighbor in explored:
+                continue
+            if usable is not None and not usable(action):
+                continue
+            previous = relaxed.get(action)
+            if previous is not None and previous is not node and previous.cost <= node.cost:
+                continue
+            relaxed[action] = node
+            total = node.cost + cost(action, neighbor)
+            priority = total if heuristic is None else total + heuristic(neighbor)
+            queued = frontier.priority(neighbor)
+            if queued is not None and queued <= priority:
+                continue
+            frontier.add(Node(state=neighbor, parent=node, action=action, cost=total), priority)
+
+    return None
+
+
+def unit_cost(movie_id, person_id):
+    return 1
+
+
+# Reference year for recency_cost, fixed when the module loads
+THIS_YEAR = date.today().year
+
+
+def recency_cost(movie_id, person_id):
+    """
+    Returns 1 plus a tenth of the movie's age in years, so recent
+    movies make cheaper connections. Movies without a year cost 11.
+    """
+    try:
+        age = THIS_YEAR - int(movie_year(movie_id))
+    except ValueError:
+        return 11
+    return 1 + max(age, 0) / 10
+
+
+def movie_year(movie_id):
+    """
+    Returns the year of a movie without building its cast.
+    """
+    if graph is None:
+        return movies[movie_id]["year"]
+
+    # Looking a movie up by IMDB id is a binary search, so remember recent ones
+    year = year_cache.get(movie_id)
+    if year is None:
+        year = graph.movie_years[graph.movie_index(movie_id)]
+        year_cache.put(movie_id, year)
+    return year
+
+
+# Edge costs selectable from the command line
+COSTS = {
+    "recency": recency_cost,
+}
+
+
+def movie_filter(years=None, allow=None, deny=None):
+    """
+    Returns a function telling whether a movie_id may be used by a
+    search constrained as in shortest_path, for the dict and sqlite
+    backends.
+    """
+    allowed = None
+    if years is not None:
+        first, last = years
+        if store is not None:
+            allowed = store.movies_between(first, last)
+        else:
+            allowed = set()
+            for year, movie_ids in year_index().items():
+                if first <= year <= last:
+                    allowed |= movie_ids
+    if allow is not None:
+        allowed = set(allow) if allowed is None else allowed & set(allow)
+    denied = set(deny or ())
+    if allowed is None:
+        return lambda movie_id: movie_id not in denied
+    return (allowed - denied).__contains__
+
+
+def year_index():
+    """
+    Returns {year: set of movie_ids} for the dict backend, building it
+    on first use. Movies without a numeric year are left out.
+    """
+    global movie_years
+    if movie_years is None:
+        movie_years = {}
+        for movie_id, movie in movies.items():
+            add_movie_year(movie_id, movie["year"])
+    return movie_years
+
+
+def add_movie_year(movie_id, year):
+    try:
+        year = int(year)
+    except ValueError:
+        return
+    movie_years.setdefault(year, set()).add(movie_id)
+
+
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
@@ -192,11 +606,119 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def resolve_person(person):
+    """
+    Returns the IMDB id for an IMDB id or an unambiguous name,
+    without prompting. Raises ValueError otherwise.
+    """
+    if person in people:
+        return person
+    person_ids = names.get(person.lower(), set())
+    if len(person_ids) == 0:
+        raise ValueError(f"person not found: {person}")
+    if len(person_ids) > 1:
+        raise ValueError(f"ambiguous name: {person}")
+    return next(iter(person_ids))
+
+
+def person_ids_for_prefix(prefix, limit=10):
+    """
+    Returns up to `limit` IMDB ids of people whose name starts
+    with `prefix`, shortest completions first.
+    """
+    index = load_name_index()
+    return index.person_ids(index.prefix(prefix, limit))[:limit]
+
+
+def person_ids_for_fuzzy_name(name, max_distance=2, limit=10):
+    """
+    Returns up to `limit` IMDB ids of people whose name is within
+    `max_distance` edits of `name`, closest first.
+    """
+    index = load_name_index()
+    matches = index.fuzzy(name, max_distance, limit)
+    return index.person_ids(match for _, match in matches)[:limit]
+
+
+def load_name_index():
+    """
+    Returns the NameIndex over `names`, building it if needed.
+    """
+    global name_index
+    if name_index is None:
+        name_index = NameIndex(names)
+    return name_index
+
+
+def not_found(name):
+    """
+    Returns a "not found" message suggesting close or completed names.
+    """
+    person_ids = person_ids_for_fuzzy_name(name, limit=5) or person_ids_for_prefix(name, limit=5)
+    if not person_ids:
+        return "Person not found."
+    suggestions = ", ".join(dict.fromkeys(people[p]["name"] for p in person_ids))
+    return f"Person not found. Did you mean: {suggestions}?"
+
+
+def cache_neighbors(budget):
+    """
+    Memoize neighbors_for_person in an LRU cache holding about `budget`
+    bytes of co-star sets. A budget of 0 turns the cache off.
+    """
+    global neighbor_cache
+    neighbor_cache = LRUCache(budget, weigh=neighbors_size) if budget else None
+
+
+def clear_neighbors():
+    """
+    Drop every cached co-star set, since loading or appending data
+    can change them.
+    """
+    if neighbor_cache is not None:
+        with neighbor_lock:
+            neighbor_cache.clear()
+
+
+def neighbors_size(neighbors):
+    """
+    Returns the approximate bytes held by a cached co-star set; the ids
+    themselves are shared with `people` and `movies`.
+    """
+    return sys.getsizeof(neighbors) + len(neighbors) * sys.getsizeof((None, None))
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if neighbor_cache is not None:
+        # Server threads share the cache, whose lookups reorder it
+        with neighbor_lock:
+            neighbors = neighbor_cache.get(person_id)
+        if neighbors is None:
+            neighbors = frozenset(find_neighbors(person_id))
+            with neighbor_lock:
+                neighbor_cache.put(person_id, neighbors)
+        return neighbors
+    return find_neighbors(person_id)
+
+
+def find_neighbors(person_id):
+    """
+    Returns (movie_id, person_id) pairs for people who starred with a
+    given person, bypassing the cache.
+    """
+    if store is not None:
+        return store.neighbors(person_id)
+    if graph is not None:
+        person = graph.person_index(person_id)
+        return {
+            (graph.movie_ids[movie], graph.person_ids[neighbor])
+            for movie, neighbor in graph.neighbors(person)
+        }
+
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -0,0 +1,652 @@
+import csv
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+
+from util import Node, PriorityFrontier
+
+# Byte-per-movie expansions of each packed bitset byte, 1 where a bit is clear
+UNPACK = [bytes(1 - (byte >> bit & 1) for bit in range(8)) for byte in range(256)]
+
+
+class StringTable():
+    """
+    Packed UTF-8 strings addressed by dense integer index, plus a list
+    of strings appended after packing.
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+        self.added = []
+
+    @classmethod
+    def pack(cls, strings):
+        """
+        Returns a StringTable holding `strings` in order.
+        """
+        offsets = array("q", [0])
+        chunks = []
+        total = 0
+        for string in strings:
+            chunk = string.encode("utf-8")
+            chunks.append(chunk)
+            total += len(chunk)
+            offsets.append(total)
+        return cls(b"".join(chunks), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1 + len(self.added)
+
+    def __getitem__(self, index):
+        packed = len(self.offsets) - 1
+        if index >= packed:
+            return self.added[index - packed]
+        return str(self.data[self.offsets[index]:self.offsets[index + 1]], "utf-8")
+
+    def append(self, string):
+        """
+        Adds `string` at the next index without repacking.
+        """
+        self.added.append(string)
+
+
+class CoStarGraph():
+    """
+    Bipartite person/movie graph with dense integer ids and CSR adjacency.
+
+    Person `p` starred in movies `person_movies[person_offsets[p]:person_offsets[p + 1]]`
+    and movie `m` has stars `movie_people[movie_offsets[m]:movie_offsets[m + 1]]`.
+    People, movies and star links added after the graph was built are
+    kept in small dicts alongside the arrays.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies, movie_offsets, movie_people,
+                 person_order, movie_order, name_order):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_people = movie_people
+
+        # Indices sorted by IMDB id and by lowercased name, for binary search
+        self.person_order = person_order
+        self.movie_order = movie_order
+        self.name_order = name_order
+
+        # Appended entries: ids and names to indices, and extra star links
+        self.added_people = {}
+        self.added_movie_ids = {}
+        self.added_names = {}
+        self.added_movies = {}
+        self.added_stars = {}
+
+        # Bitsets of movie indices by release year, built by year_index
+        self.years = None
+        self.years_count = 0
+
+    @classmethod
+    def from_csv(cls, directory):
+        """
+        Builds a graph from the people, movies and stars CSV files in `directory`.
+        """
+        person_ids, person_names, person_births = [], [], []
+        person_index = {}
+        with open(f"{directory}/people.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row["id"] in person_index:
+                    continue
+                person_index[row["id"]] = len(person_ids)
+                person_ids.append(row["id"])
+                person_names.append(row["name"])
+                person_births.append(row["birth"])
+
+        movie_ids, movie_titles, movie_years = [], [], []
+        movie_index = {}
+        with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row["id"] in movie_index:
+                    continue
+                movie_index[row["id"]] = len(movie_ids)
+                movie_ids.append(row["id"])
+                movie_titles.append(row["title"])
+                movie_years.append(row["year"])
+
+        # Encode every star link as a single integer so they sort and dedupe cheaply
+        total_movies = len(movie_ids)
+        links = array("q")
+        with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    person = person_index[row["person_id"]]
+                    movie = movie_index[row["movie_id"]]
+                except KeyError:
+                    continue
+                links.append(person * total_movies + movie)
+        links = array("q", sorted(set(links)))
+
+        return cls.from_links(
+            person_ids, person_names, person_births,
+            movie_ids, movie_titles, movie_years, links
+        )
+
+    @classmethod
+    def from_links(cls, person_ids, person_names, person_births,
+                   movie_ids, movie_titles, movie_years, links):
+        """
+        Builds a graph from person and movie columns plus sorted, unique
+        star links encoded as `person * len(movie_ids) + movie`.
+        """
+        total_people = len(person_ids)
+        total_movies = len(movie_ids)
+
+        # Links are sorted by person, so the person side fills in order
+        person_offsets = array("q", [0]) * (total_people + 1)
+        person_movies = array("i", [0]) * len(links)
+        movie_counts = array("q", [0]) * (total_movies + 1)
+        for k, link in enumerate(links):
+            person, movie = divmod(link, total_movies)
+            person_offsets[person + 1] += 1
+            person_movies[k] = movie
+            movie_counts[movie + 1] += 1
+        for person in range(total_people):
+            person_offsets[person + 1] += person_offsets[person]
+        for movie in range(total_movies):
+            movie_counts[movie + 1] += movie_counts[movie]
+
+        # Counting sort the same links into the movie side
+        movie_offsets = array("q", movie_counts)
+        movie_people = array("i", [0]) * len(links)
+        for person in range(total_people):
+            for k in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[k]
+                movie_people[movie_counts[movie]] = person
+                movie_counts[movie] += 1
+
+        return cls(
+            StringTable.pack(person_ids),
+            StringTable.pack(person_names),
+            StringTable.pack(person_births),
+            StringTable.pack(movie_ids),
+            StringTable.pack(movie_titles),
+            StringTable.pack(movie_years),
+            person_offsets, person_movies, movie_offsets, movie_people,
+            array("i", sorted(range(total_people), key=person_ids.__getitem__)),
+            array("i", sorted(range(total_movies), key=movie_ids.__getitem__)),
+            array("i", sorted(range(total_people), key=lambda p: person_names[p].lower())),
+        )
+
+    def person_count(self):
+        return len(self.person_ids)
+
+    def movie_count(self):
+        return len(self.movie_ids)
+
+    def person_index(self, person_id):
+        """
+        Returns the dense index for an IMDB person id, or None.
+        """
+        order = self.person_order
+        i = bisect_left(order, person_id, key=self.person_ids.__getitem__)
+        if i < len(order) and self.person_ids[order[i]] == person_id:
+            return order[i]
+        return self.added_people.get(person_id)
+
+    def movie_index(self, movie_id):
+        """
+        Returns the dense index for an IMDB movie id, or None.
+        """
+        order = self.movie_order
+        i = bisect_left(order, movie_id, key=self.movie_ids.__getitem__)
+        if i < len(order) and self.movie_ids[order[i]] == movie_id:
+            return order[i]
+        return self.added_movie_ids.get(movie_id)
+
+    def people_named(self, name):
+        """
+        Returns the indices of people whose lowercased name is `name`.
+        """
+        key = self.lowercase_name
+        start = bisect_left(self.name_order, name, key=key)
+        end = bisect_right(self.name_order, name, lo=start, key=key)
+        return list(self.name_order[start:end]) + self.added_names.get(name, [])
+
+    def lowercase_name(self, person):
+        return self.person_names[person].lower()
+
+    def movies_for(self, person):
+        """
+        Returns the indices of the movies `person` starred in.
+        """
+        offsets = self.person_offsets
+        if person + 1 < len(offsets):
+            movies = self.person_movies[offsets[person]:offsets[person + 1]]
+        else:
+            movies = ()
+        added = self.added_movies.get(person)
+        return movies if added is None else [*movies, *added]
+
+    def stars_for(self, movie):
+        """
+        Returns the indices of the people who starred in `movie`.
+        """
+        offsets = self.movie_offsets
+        if movie + 1 < len(offsets):
+            stars = self.movie_people[offsets[movie]:offsets[movie + 1]]
+        else:
+            stars = ()
+        added = self.added_stars.get(movie)
+        return stars if added is None else [*stars, *added]
+
+    def add_person(self, person_id, name, birth):
+        """
+        Adds a person unless `person_id` is already known.
+        Returns the person's index.
+        """
+        person = self.person_index(person_id)
+        if person is not None:
+            return person
+        person = self.person_count()
+        self.person_ids.append(person_id)
+        self.person_names.append(name)
+        self.person_births.append(birth)
+        self.added_people[person_id] = person
+        self.added_names.setdefault(name.lower(), []).append(person)
+        return person
+
+    def add_movie(self, movie_id, title, year):
+        """
+        Adds a movie unless `movie_id` is already known.
+        Returns the movie's index.
+        """
+        movie = self.movie_index(movie_id)
+        if movie is not None:
+            return movie
+        movie = self.movie_count()
+        self.movie_ids.append(movie_id)
+        self.movie_titles.append(title)
+        self.movie_years.append(year)
+        self.added_movie_ids[movie_id] = movie
+        return movie
+
+    def year_index(self):
+        """
+        Returns {year: bitset} where bit `m` of the int bitset is set if
+        movie `m` came out that year. Built on first use and extended as
+        movies are added; movies without a numeric year are left out.
+        """
+        count = self.movie_count()
+        if self.years is not None and self.years_count == count:
+            return self.years
+        buckets = {}
+        for movie in range(count):
+            try:
+                year = int(self.movie_years[movie])
+            except ValueError:
+                continue
+            bucket = buckets.get(year)
+            if bucket is None:
+                bucket = buckets[year] = bytearray((count + 7) // 8)
+            bucket[movie >> 3] |= 1 << (movie & 7)
+        self.years = {year: int.from_bytes(bucket, "little") for year, bucket in buckets.items()}
+        self.years_count = count
+        return self.years
+
+    def blocked_movies(self, years=None, allow=None, deny=None):
+        """
+        Returns a bytearray with a 1 for every movie index a constrained
+        search may not use: those outside the inclusive (first, last)
+        `years` range, not among the `allow` movie ids if given, or
+        among the `deny` movie ids.
+        """
+        count = self.movie_count()
+        if years is None:
+            blocked = bytearray(count)
+        else:
+            first, last = years
+            bits = 0
+            for year, bitset in self.year_index().items():
+                if first <= year <= last:
+                    bits |= bitset
+            packed = bits.to_bytes((count + 7) // 8, "little")
+            blocked = bytearray(b"".join(map(UNPACK.__getitem__, packed))[:count])
+        if allow is not None:
+            allowed = bytearray(count)
+            for movie_id in allow:
+                movie = self.movie_index(movie_id)
+                if movie is not None and not blocked[movie]:
+                    allowed[movie] = 1
+            blocked = allowed.translate(bytes([1, 0]) + bytes(254))
+        for movie_id in deny or ():
+            movie = self.movie_index(movie_id)
+            if movie is not None:
+                blocked[movie] = 1
+        return blocked
+
+    def add_star(self, person_id, movie_id):
+        """
+        Links a known person to a known movie.
+        Returns False if either is unknown or the link already exists.
+        """
+        person = self.person_index(person_id)
+        movie = self.movie_index(movie_id)
+        if person is None or movie is None or movie in self.movies_for(person):
+            return False
+        self.added_movies.setdefault(person, []).append(movie)
+        self.added_stars.setdefault(movie, []).append(person)
+        return True
+
+    def neighbors(self, person):
+        """
+        Yields (movie, person) index pairs for people who starred with `person`.
+        """
+        for movie in self.movies_for(person):
+            for neighbor in self.stars_for(movie):
+                yield movie, neighbor
+
+    def distances(self, source, unreachable=0xFFFF):
+        """
+        Returns an array('H') of BFS distances from `source` to every
+        person, with `unreachable` for people in other components.
+        """
+        movies_for, stars_for = self.movies_for, self.stars_for
+
+        distance = array("H", [unreachable]) * self.person_count()
+        distance[source] = 0
+        expanded = bytearray(self.movie_count())
+        layer = [source]
+        depth = 0
+        while layer:
+            depth += 1
+            next_layer = []
+            for person in layer:
+                for movie in movies_for(person):
+                    if expanded[movie]:
+                        continue
+                    expanded[movie] = 1
+                    for neighbor in stars_for(movie):
+                        if distance[neighbor] == unreachable:
+                            distance[neighbor] = depth
+                            next_layer.append(neighbor)
+            layer = next_layer
+        return distance
+
+    def search(self, source, target, bidirectional=False, blocked=None):
+        """
+        Returns the shortest list of (movie, person) index pairs that
+        connect the source to the target, or None if not connected.
+
+        Movies marked in the `blocked` bytearray from blocked_movies
+        are never used.
+        """
+        if source == target:
+            return []
+        if bidirectional:
+            return self.bidirectional_search(source, target, blocked)
+
+        movies_for, stars_for = self.movies_for, self.stars_for
+
+        # A movie's whole cast is reached the first time it is expanded,
+        # and blocked movies start out as already expanded
+        expanded = self.unexpanded(blocked)
+        parents = {source: None}
+        layer = [source]
+        while layer:
+            next_layer = []
+            for person in layer:
+                for movie in movies_for(person):
+                    if expanded[movie]:
+                        continue
+                    expanded[movie] = 1
+                    for neighbor in stars_for(movie):
+                        if neighbor in parents:
+                            continue
+                        parents[neighbor] = (movie, person)
+                        if neighbor == target:
+                            return self.trace(parents, {target: None}, target)
+                        next_layer.append(neighbor)
+            layer = next_layer
+        return None
+
+    def bidirectional_search(self, source, target, blocked=None, prune=None):
+        """
+        Returns the shortest list of (movie, person) index pairs that
+        connect the source to the target, expanding the smaller of a
+        forward and a backward BFS layer at each step.
+
+        If `prune(person, depth, end)` is given, a person `depth` layers
+        from one end is not expanded when it returns true, which it may
+        only do when no shortest path to the other `end` runs through it.
+        """
+        movies_for, stars_for = self.movies_for, self.stars_for
+
+        def expand(layer, depth, end, parents, others, expanded):
+            next_layer = []
+            for person in layer:
+                # Only people about to be expanded are checked, since most
+                # people reached in the final layer never are
+                if prune is not None and prune(person, depth, end):
+                    continue
+                for movie in movies_for(person):
+                    if expanded[movie]:
+                        continue
+                    expanded[movie] = 1
+                    for neighbor in stars_for(movie):
+                        if neighbor in parents:
+                            continue
+                        parents[neighbor] = (movie, person)
+                        if neighbor in others:
+                            return next_layer, neighbor
+                        next_layer.append(neighbor)
+            return next_layer, None
+
+        forward = {source: None}
+        backward = {target: None}
+        forward_expanded = self.unexpanded(blocked)
+        backward_expanded = self.unexpanded(blocked)
+        forward_layer, forward_depth = [source], 0
+        backward_layer, backward_depth = [target], 0
+        while forward_layer and backward_layer:
+            if len(forward_layer) <= len(backward_layer):
+                forward_layer, meeting = expand(
+                    forward_layer, forward_depth, target, forward, backward, forward_expanded
+                )
+                forward_depth += 1
+            else:
+                backward_layer, meeting = expand(
+                    backward_layer, backward_depth, source, backward, forward, backward_expanded
+                )
+                backward_depth += 1
+            if meeting is not None:
+                return self.trace(forward, backward, meeting)
+        return None
+
+    def cheapest_path(self, source, target, cost, heuristic=None, blocked=None):
+        """
+        Returns the list of (movie_id, person_id) pairs with the lowest
+        total cost from the source to the target, or None.
+
+        `cost(movie_id, person_id)` is as in degrees.astar, while
+        `heuristic` takes person indices. Movies marked in the `blocked`
+        bytearray from blocked_movies are never used.
+        """
+        source = self.person_index(source)
+        target = self.person_index(target)
+        if source is None or target is None:
+            return None
+
+        frontier = PriorityFrontier()
+        frontier.add(Node(state=source, parent=None, action=None), 0)
+        explored = bytearray(self.person_count())
+
+        # Lowest cost of a node each movie's cast was reached from
+        relaxed = {}
+        while not frontier.empty():
+            node = frontier.remove()
+            person = node.state
+            if person == target:
+                path = []
+                while node.parent is not None:
+                    path.append((self.movie_ids[node.action], self.person_ids[node.state]))
+                    node = node.parent
+                path.reverse()
+                return path
+
+            explored[person] = 1
+            for movie in self.movies_for(person):
+                if blocked is not None and movie < len(blocked) and blocked[movie]:
+                    continue
+                if relaxed.get(movie, node.cost + 1) <= node.cost:
+                    continue
+                relaxed[movie] = node.cost
+                movie_id = self.movie_ids[movie]
+                for neighbor in self.stars_for(movie):
+                    if explored[neighbor]:
+                        continue
+                    total = node.cost + cost(movie_id, self.person_ids[neighbor])
+                    priority = total if heuristic is None else total + heuristic(neighbor)
+                    queued = frontier.priority(neighbor)
+                    if queued is not None and queued <= priority:
+                        continue
+                    frontier.add(Node(state=neighbor, parent=node, action=movie, cost=total), priority)
+        return None
+
+    def unexpanded(self, blocked=None):
+        """
+        Returns a fresh bytearray of expanded flags for every movie,
+        with only `blocked` movies set.
+        """
+        if blocked is None:
+            return bytearray(self.movie_count())
+        return bytearray(blocked) + bytearray(self.movie_count() - len(blocked))
+
+    def trace(self, forward, backward, meeting):
+        """
+        Joins forward and backward parent links through `meeting`
+        into a list of (movie, person) index pairs.
+        """
+        path = []
+        person = meeting
+        while forward[person] is not None:
+            movie, parent = forward[person]
+            path.append((movie, person))
+            person = parent
+        path.reverse()
+        person = meeting
+        while backward[person] is not None:
+            movie, person = backward[person]
+            path.append((movie, person))
+        return path
+
+    def shortest_path(self, source, target, bidirectional=False, blocked=None):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target, or None.
+        """
+        source = self.person_index(source)
+        target = self.person_index(target)
+        if source is None or target is None:
+            return None
+        path = self.search(source, target, bidirectional, blocked)
+        if path is None:
+            return None
+        return [(self.movie_ids[movie], self.person_ids[person]) for movie, person in path]
+
+    def person(self, person):
+        """
+        Returns the dict layout degrees.people uses for a person index.
+        """
+        return {
+            "name": self.person_names[person],
+            "birth": self.person_births[person],
+            "movies": {self.movie_ids[movie] for movie in self.movies_for(person)},
+        }
+
+    def movie(self, movie):
+        """
+        Returns the dict layout degrees.movies uses for a movie index.
+        """
+        return {
+            "title": self.movie_titles[movie],
+            "year": self.movie_years[movie],
+            "stars": {self.person_ids[person] for person in self.stars_for(movie)},
+        }
+
+
+class PeopleView(Mapping):
+    """
+    Read-only `degrees.people` mapping backed by a CoStarGraph.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        person = self.graph.person_index(person_id)
+        if person is None:
+            raise KeyError(person_id)
+        return self.graph.person(person)
+
+    def __iter__(self):
+        return (self.graph.person_ids[p] for p in range(self.graph.person_count()))
+
+    def __len__(self):
+        return self.graph.person_count()
+
+
+class MoviesView(Mapping):
+    """
+    Read-only `degrees.movies` mapping backed by a CoStarGraph.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        movie = self.graph.movie_index(movie_id)
+        if movie is None:
+            raise KeyError(movie_id)
+        return self.graph.movie(movie)
+
+    def __iter__(self):
+        return (self.graph.movie_ids[m] for m in range(self.graph.movie_count()))
+
+    def __len__(self):
+        return self.graph.movie_count()
+
+
+class NamesView(Mapping):
+    """
+    Read-only `degrees.names` mapping backed by a CoStarGraph.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, name):
+        people = self.graph.people_named(name)
+        if not people:
+            raise KeyError(name)
+        return {self.graph.person_ids[person] for person in people}
+
+    def __iter__(self):
+        previous = None
+        for person in self.graph.name_order:
+            name = self.graph.lowercase_name(person)
+            if name != previous:
+                yield name
+                previous = name
+        # Names only appended people have
+        for name, added in self.graph.added_names.items():
+            if len(self.graph.people_named(name)) == len(added):
+                yield name
+
+    def __len__(self):
+        return sum(1 for _ in self)
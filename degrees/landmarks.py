@@ -0,0 +1,199 @@
+import argparse
+import hashlib
+import json
+import os
+
+from snapshot import load_graph, read_header, source_stamp, write_header
+
+MAGIC = b"DEGLMRK\0"
+VERSION = 1
+
+# Name of the landmark file written next to the CSV files
+FILENAME = "degrees.landmarks"
+
+# Distance recorded for people a landmark cannot reach
+UNREACHABLE = 0xFFFF
+
+
+def choose_landmarks(graph, count):
+    """
+    Returns the indices of the `count` people who starred in the most movies.
+    """
+    people = range(graph.person_count())
+    return sorted(people, key=lambda p: len(graph.movies_for(p)), reverse=True)[:count]
+
+
+def build_landmarks(graph, path, count, stamp):
+    """
+    Runs a BFS from each of `count` landmark people and writes their
+    distance arrays to `path`, tagged with the source `stamp`.
+    """
+    landmarks = choose_landmarks(graph, count)
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        write_header(f, MAGIC, {
+            "version": VERSION,
+            "sources": stamp,
+            "people": graph.person_count(),
+            "landmarks": landmarks,
+        })
+        for landmark in landmarks:
+            f.write(graph.distances(landmark, UNREACHABLE))
+    os.replace(temporary, path)
+
+
+class LandmarkOracle():
+    """
+    ALT distance bounds from precomputed landmark BFS distances.
+
+    By the triangle inequality, for any landmark L the distance between
+    s and t is at least |d(L, s) - d(L, t)| and at most d(L, s) + d(L, t).
+    """
+
+    def __init__(self, graph, landmarks, rows):
+        self.graph = graph
+        self.landmarks = landmarks
+        self.rows = rows
+
+    @classmethod
+    def open(cls, graph, path, stamp=None):
+        """
+        Returns the oracle memory-mapped from `path`, or None if the file
+        is missing, stale or written for a different graph.
+        """
+        opened = read_header(path, MAGIC, VERSION, stamp)
+        if opened is None:
+            return None
+        view, header, base = opened
+        if header["people"] != graph.person_count():
+            return None
+
+        size = 2 * header["people"]
+        rows = [
+            view[base + i * size:base + (i + 1) * size].cast("H")
+            for i in range(len(header["landmarks"]))
+        ]
+        return cls(graph, header["landmarks"], rows)
+
+    def bounds(self, source, target):
+        """
+        Returns (lower, upper) bounds on the degrees between two person
+        indices. `upper` is None when no landmark reaches both, and
+        `lower` is None when the two are provably not connected.
+        """
+        lower, upper = 0, None
+        for row in self.rows:
+            s, t = row[source], row[target]
+            if (s == UNREACHABLE) != (t == UNREACHABLE):
+                return None, None
+            if s == UNREACHABLE:
+                continue
+            lower = max(lower, abs(s - t))
+            if upper is None or s + t < upper:
+                upper = s + t
+        return lower, upper
+
+    def heuristic(self, target, min_cost=1):
+        """
+        Returns an A* heuristic on person indices towards `target`: the
+        lower bound on degrees times the lowest cost of one movie.
+        """
+        def heuristic(person):
+            lower, _ = self.bounds(person, target)
+            return float("inf") if lower is None else lower * min_cost
+        return heuristic
+
+    def search(self, source, target):
+        """
+        Returns the shortest list of (movie, person) index pairs between
+        two person indices.
+
+        Runs a bidirectional BFS that does not expand any person whose
+        depth plus landmark lower bound to the far end exceeds the best
+        upper bound, since no shortest path can pass through them.
+        """
+        if source == target:
+            return []
+        lower, upper = self.bounds(source, target)
+        if lower is None:
+            return None
+
+        if upper is None:
+            return self.graph.bidirectional_search(source, target)
+
+        def lower_bound(ends):
+            """
+            Returns a function bounding the degrees from a person to the
+            person whose landmark distances are `ends`.
+            """
+            def bound(person):
+                best = 0
+                for row, end in ends:
+                    d = row[person]
+                    if (d == UNREACHABLE) != (end == UNREACHABLE):
+                        return UNREACHABLE
+                    if d != UNREACHABLE and abs(d - end) > best:
+                        best = abs(d - end)
+                return best
+            return bound
+
+        bounds = {
+            target: lower_bound([(row, row[target]) for row in self.rows]),
+            source: lower_bound([(row, row[source]) for row in self.rows]),
+        }
+
+        def prune(person, depth, end):
+            return depth + bounds[end](person) > upper
+
+        return self.graph.bidirectional_search(source, target, prune=prune)
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target, or None.
+        """
+        graph = self.graph
+        source = graph.person_index(source)
+        target = graph.person_index(target)
+        if source is None or target is None:
+            return None
+        path = self.search(source, target)
+        if path is None:
+            return None
+        return [(graph.movie_ids[movie], graph.person_ids[person]) for movie, person in path]
+
+
+def load_landmarks(graph, directory, count, appended=None):
+    """
+    Returns the LandmarkOracle for the dataset in `directory`, building
+    and saving `count` landmarks if the file is missing or stale.
+
+    `appended` lists the delta rows merged into `graph` without being
+    journaled, which the file must also have been built with.
+    """
+    path = os.path.join(directory, FILENAME)
+    stamp = source_stamp(directory, journal=True)
+    if appended:
+        rows = json.dumps(appended).encode("utf-8")
+        stamp["appended"] = hashlib.sha256(rows).hexdigest()
+    oracle = LandmarkOracle.open(graph, path, stamp)
+    if oracle is not None and len(oracle.landmarks) == count:
+        return oracle
+    build_landmarks(graph, path, count, stamp)
+    return LandmarkOracle.open(graph, path, stamp)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute degrees landmarks.")
+    parser.add_argument("directory")
+    parser.add_argument("--count", type=int, default=16, help="number of landmarks")
+    args = parser.parse_args()
+
+    graph = load_graph(args.directory)
+    oracle = load_landmarks(graph, args.directory, args.count)
+    names = ", ".join(graph.person_names[p] for p in oracle.landmarks)
+    print(f"{len(oracle.landmarks)} landmarks: {names}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+
+
+class NameIndex():
+    """
+    Prefix and typo-tolerant lookups over the lowercased names in a
+    `degrees.names` mapping.
+
+    Prefix queries binary search a sorted list of names. Fuzzy queries
+    use an inverted index from positional character trigrams to names,
+    which is built on first use.
+    """
+
+    def __init__(self, names):
+        self.names = names
+        self.sorted_names = sorted(names)
+        self.grams = None
+
+    def add(self, name):
+        """
+        Indexes a name added to the mapping after the index was built.
+        """
+        i = bisect_left(self.sorted_names, name)
+        if i < len(self.sorted_names) and self.sorted_names[i] == name:
+            return
+        insort(self.sorted_names, name)
+
+        # Positions shifted, so the trigram index is rebuilt when next needed
+        self.grams = None
+
+    def prefix(self, prefix, limit=10):
+        """
+        Returns up to `limit` names starting with `prefix`, shortest first.
+        """
+        if limit <= 0:
+            return []
+        prefix = prefix.lower()
+        start = bisect_left(self.sorted_names, prefix)
+
+        # Rank only a bounded window of completions to stay fast on short prefixes
+        matches = []
+        for name in self.sorted_names[start:start + limit * 10]:
+            if not name.startswith(prefix):
+                break
+            matches.append(name)
+        matches.sort(key=lambda name: (len(name), name))
+        return matches[:limit]
+
+    def fuzzy(self, query, max_distance=2, limit=10):
+        """
+        Returns up to `limit` (distance, name) pairs for names within
+        `max_distance` edits of `query`, closest first. Queries shorter
+        than `3 * max_distance - 1` characters allow fewer edits.
+        """
+        if limit <= 0:
+            return []
+        query = query.lower()
+        if self.grams is None:
+            self.build_grams()
+
+        # Short queries are held to fewer edits so matches share a trigram
+        max_distance = min(max_distance, (len(query) + 1) // 3)
+
+        # Each edit changes at most three trigrams and shifts the rest by
+        # at most one position, so a match shares all but 3 * distance of
+        # the query's trigrams within `max_distance` positions
+        windows = []
+        for position, gram in enumerate(trigrams(query)):
+            window = [
+                self.grams[gram, shifted]
+                for shifted in range(position - max_distance, position + max_distance + 1)
+                if (gram, shifted) in self.grams
+            ]
+            windows.append((sum(len(postings) for postings in window), window))
+        windows.sort(key=lambda window: window[0])
+
+        # Skip counting the most common trigrams, as long as a match still
+        # has to share at least half of the required ones that are counted
+        total = len(windows)
+        skipped = max((total - 3 * max_distance) // 2, 0)
+        needed = total - 3 * max_distance - skipped
+        counts = Counter()
+        for size, window in windows[:total - skipped]:
+            for postings in window:
+                counts.update(postings)
+        buckets = {}
+        for i, count in counts.items():
+            if count >= needed:
+                buckets.setdefault(count, []).append(i)
+
+        # Verify candidates sharing the most trigrams first, and stop once
+        # the unshared ones rule out beating the matches found so far
+        matches = []
+        for count in sorted(buckets, reverse=True):
+            lower = -(-(total - skipped - count) // 3)
+            if len(matches) >= limit and lower > matches[-1][0]:
+                break
+            for i in buckets[count]:
+                distance = edit_distance(query, self.sorted_names[i], max_distance)
+                if distance is not None:
+                    matches.append((distance, self.sorted_names[i]))
+            matches.sort(key=lambda match: (match[0], len(match[1]), match[1]))
+            del matches[limit:]
+        return matches
+
+    def build_grams(self):
+        """
+        Builds the (trigram, position) posting lists over the sorted names.
+        """
+        grams = {}
+        for i, name in enumerate(self.sorted_names):
+            for key in enumerate(trigrams(name)):
+                postings = grams.get(key[::-1])
+                if postings is None:
+                    postings = grams[key[::-1]] = array("i")
+                postings.append(i)
+        self.grams = grams
+
+    def person_ids(self, names):
+        """
+        Returns the person ids for each of `names`, in order.
+        """
+        person_ids = []
+        for name in names:
+            person_ids.extend(sorted(self.names.get(name, ())))
+        return person_ids
+
+
+def trigrams(name):
+    """
+    Returns the character trigrams of `name` padded with two boundary
+    markers on each side.
+    """
+    padded = f"\0\0{name}\0\0"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def edit_distance(a, b, bound):
+    """
+    Returns the Levenshtein distance between `a` and `b`,
+    or None if it exceeds `bound`.
+
+    Only cells within `bound` of the diagonal are computed, since any
+    alignment leaving that band already costs more than `bound`.
+    """
+    if abs(len(a) - len(b)) > bound:
+        return None
+    over = bound + 1
+    previous = [j if j <= bound else over for j in range(len(b) + 1)]
+    for i, x in enumerate(a, 1):
+        low = max(1, i - bound)
+        high = min(len(b), i + bound)
+        current = [over] * (len(b) + 1)
+        if i <= bound:
+            current[0] = i
+        for j in range(low, high + 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (x != b[j - 1]),
+            )
+        if min(current[low - 1:high + 1]) > bound:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= bound else None
@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import degrees
+from util import LRUCache
+
+# Recent shortest_path results keyed on the unordered pair of person_ids
+cache = None
+cache_lock = threading.Lock()
+
+# Returned by the cache for pairs it does not hold, since None means "not connected"
+MISSING = object()
+
+# Most people a name lookup returns
+MAX_LIMIT = 100
+
+
+def reverse_path(source, path):
+    """
+    Returns the (movie_id, person_id) path from the end of `path`
+    back to `source`.
+    """
+    people = [source] + [person_id for _, person_id in path]
+    return [(path[i][0], people[i]) for i in reversed(range(len(path)))]
+
+
+def cached_shortest_path(source, target):
+    """
+    Returns degrees.shortest_path(source, target), answering from the
+    LRU cache when either direction of the pair was asked recently.
+    """
+    key = (source, target) if source <= target else (target, source)
+    with cache_lock:
+        path = cache.get(key, MISSING)
+    if path is MISSING:
+        path = degrees.shortest_path(key[0], key[1], bidirectional=True)
+        with cache_lock:
+            cache.put(key, path)
+    if path is not None and key[0] != source:
+        path = reverse_path(key[0], path)
+    return path
+
+
+def string_param(params, name):
+    """
+    Returns the parameter `name`, raising KeyError if it is missing and
+    ValueError if a JSON body gave it as anything but a string.
+    """
+    value = params[name]
+    if not isinstance(value, str):
+        raise ValueError(f"parameter must be a string: {name}")
+    return value
+
+
+def limit_param(params):
+    """
+    Returns the "limit" parameter as an integer from 1 to MAX_LIMIT,
+    10 if it is missing. Raises ValueError if it is below 1.
+    """
+    limit = params.get("limit", 10)
+    if isinstance(limit, bool) or not isinstance(limit, (int, str)):
+        raise ValueError("limit must be an integer")
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    return min(limit, MAX_LIMIT)
+
+
+def shortest_path_response(params):
+    """
+    Returns the JSON response for a shortest path request.
+    """
+    source = degrees.resolve_person(string_param(params, "source"))
+    target = degrees.resolve_person(string_param(params, "target"))
+    path = cached_shortest_path(source, target)
+    return {
+        "source": source,
+        "target": target,
+        "degrees": None if path is None else len(path),
+        "path": path,
+    }
+
+
+def names_response(params):
+    """
+    Returns the JSON response for a name lookup request: exact matches
+    first, then prefix completions, then close spellings.
+    """
+    query = string_param(params, "q")
+    limit = limit_param(params)
+    person_ids = list(degrees.names.get(query.lower(), set()))
+    person_ids += degrees.person_ids_for_prefix(query, limit)
+    person_ids += degrees.person_ids_for_fuzzy_name(query, limit=limit)
+    people = []
+    for person_id in dict.fromkeys(person_ids):
+        person = degrees.people[person_id]
+        people.append({"id": person_id, "name": person["name"], "birth": person["birth"]})
+    return {"query": query, "people": people[:limit]}
+
+
+ROUTES = {
+    "/path": shortest_path_response,
+    "/names": names_response,
+    "/stats": lambda params: {
+        "cache": cache.stats(),
+        "neighbor_cache": degrees.neighbor_cache and degrees.neighbor_cache.stats(),
+    },
+}
+
+
+class DegreesHandler(BaseHTTPRequestHandler):
+    """
+    Answers GET requests with query parameters, or POST requests with
+    a JSON object body, for the paths in ROUTES.
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.respond(url.path, params)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            params = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            params = None
+        if not isinstance(params, dict):
+            return self.send_json(400, {"error": "body must be a JSON object"})
+        self.respond(urlparse(self.path).path, params)
+
+    def respond(self, path, params):
+        route = ROUTES.get(path)
+        if route is None:
+            return self.send_json(404, {"error": f"unknown path: {path}"})
+        try:
+            self.send_json(200, route(params))
+        except KeyError as error:
+            self.send_json(400, {"error": f"missing parameter: {error.args[0]}"})
+        except ValueError as error:
+            self.send_json(400, {"error": str(error)})
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        # Unix socket peers have no host to report
+        return self.client_address[0] if self.client_address else "unix"
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(address=("127.0.0.1", 8000), socket_path=None, cache_size=10000):
+    """
+    Returns an HTTP server for the loaded dataset, listening on a Unix
+    socket if `socket_path` is given and on `address` otherwise.
+    """
+    global cache
+    cache = LRUCache(cache_size)
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        return ThreadingUnixHTTPServer(socket_path, DegreesHandler)
+    return ThreadingHTTPServer(address, DegreesHandler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve degrees queries over HTTP.")
+    parser.add_argument("directory")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--socket", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--backend", choices=["dict", "compact", "sqlite"], default="compact")
+    parser.add_argument("--cache-size", type=int, default=10000,
+                        help="number of shortest paths to keep")
+    parser.add_argument("--neighbor-cache", type=int, default=0, metavar="MB",
+                        help="memory budget for cached co-star sets (dict and sqlite backends)")
+    args = parser.parse_args()
+    if args.neighbor_cache and args.backend == "compact":
+        parser.error("--neighbor-cache only applies to the dict and sqlite backends")
+
+    print("Loading data...")
+    degrees.cache_neighbors(args.neighbor_cache * 1024 * 1024)
+    degrees.load_data(args.directory, backend=args.backend)
+    server = make_server((args.host, args.port), args.socket, args.cache_size)
+    print(f"Serving on {args.socket or f'http://{args.host}:{args.port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import argparse
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+
+from graph import CoStarGraph, StringTable
+
+MAGIC = b"DEGREES\0"
+VERSION = 1
+
+# Name of the snapshot file written next to the CSV files
+FILENAME = "degrees.snapshot"
+
+# Name of the append-only log of rows added after the snapshot was built
+JOURNAL = "degrees.journal"
+
+# The CSV files a snapshot is built from
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+# CoStarGraph attributes stored as flat integer arrays
+ARRAYS = (
+    "person_offsets", "person_movies", "movie_offsets", "movie_people",
+    "person_order", "movie_order", "name_order",
+)
+
+# CoStarGraph attributes stored as packed string tables
+TABLES = (
+    "person_ids", "person_names", "person_births",
+    "movie_ids", "movie_titles", "movie_years",
+)
+
+
+def source_stamp(directory, journal=False):
+    """
+    Returns the size and modification time of each CSV file in `directory`,
+    and of its journal too if `journal` is true and one exists.
+    """
+    filenames = SOURCES
+    if journal and os.path.exists(os.path.join(directory, JOURNAL)):
+        filenames += (JOURNAL,)
+    stamp = {}
+    for filename in filenames:
+        stat = os.stat(os.path.join(directory, filename))
+        stamp[filename] = [stat.st_size, stat.st_mtime_ns]
+    return stamp
+
+
+def save_snapshot(graph, path, stamp):
+    """
+    Writes `graph` to `path` as a versioned binary snapshot tagged
+    with the source `stamp`.
+    """
+    buffers = []
+    for name in ARRAYS:
+        buffers.append((name, getattr(graph, name)))
+    for name in TABLES:
+        table = getattr(graph, name)
+        buffers.append((f"{name}.data", memoryview(table.data).cast("B")))
+        buffers.append((f"{name}.offsets", table.offsets))
+
+    # Lay the sections out after the header, each aligned to 8 bytes
+    sections = {}
+    offset = 0
+    for name, buffer in buffers:
+        view = memoryview(buffer)
+        sections[name] = [view.format, offset, len(view)]
+        offset += align(view.nbytes)
+
+    # Write to a temporary file first so readers never see a partial snapshot
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        write_header(f, MAGIC, {"version": VERSION, "sources": stamp, "sections": sections})
+        for name, buffer in buffers:
+            view = memoryview(buffer)
+            f.write(view)
+            f.write(bytes(align(view.nbytes) - view.nbytes))
+    os.replace(temporary, path)
+
+
+def write_header(f, magic, header):
+    """
+    Writes `magic` and the JSON `header`, tagged with this machine's
+    byte order, to the start of the binary file `f`, then pads it to
+    where the data read back by read_header starts.
+    """
+    data = json.dumps({**header, "byteorder": sys.byteorder}).encode("utf-8")
+    f.write(magic)
+    f.write(struct.pack("<Q", len(data)))
+    f.write(data)
+    f.write(bytes(align(f.tell()) - f.tell()))
+
+
+def read_header(path, magic, version, stamp=None):
+    """
+    Returns (view, header, base) for the file at `path` written after
+    write_header: a memoryview of it mapped read-only, its header and
+    the offset its data starts at.
+
+    Returns None if the file is missing, starts with another `magic`,
+    was written by another format `version` or byte order, or does not
+    match the source `stamp`.
+    """
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if buffer[:len(magic)] != magic:
+        return None
+    (length,) = struct.unpack_from("<Q", buffer, len(magic))
+    start = len(magic) + 8
+    try:
+        header = json.loads(bytes(buffer[start:start + length]))
+    except ValueError:
+        return None
+    if header["version"] != version or header["byteorder"] != sys.byteorder:
+        return None
+    if stamp is not None and header["sources"] != stamp:
+        return None
+    return memoryview(buffer), header, align(start + length)
+
+
+def open_snapshot(path, stamp=None):
+    """
+    Returns a CoStarGraph memory-mapped from the snapshot at `path`.
+
+    Returns None if the snapshot is missing, was written by another
+    format version, or does not match the source `stamp`.
+    """
+    opened = read_header(path, MAGIC, VERSION, stamp)
+    if opened is None:
+        return None
+    view, header, base = opened
+
+    # Sections are zero-copy views into the mapping
+    sections = {}
+    for name, (typecode, offset, count) in header["sections"].items():
+        size = count * struct.calcsize(typecode)
+        sections[name] = view[base + offset:base + offset + size].cast(typecode)
+
+    fields = {name: sections[name] for name in ARRAYS}
+    for name in TABLES:
+        fields[name] = StringTable(sections[f"{name}.data"], sections[f"{name}.offsets"])
+    return CoStarGraph(**fields)
+
+
+def load_graph(directory):
+    """
+    Returns the CoStarGraph for the CSV files in `directory`, reusing
+    its snapshot when the files are unchanged and writing a fresh one
+    otherwise.
+    """
+    path = os.path.join(directory, FILENAME)
+    stamp = source_stamp(directory)
+    graph = open_snapshot(path, stamp)
+    if graph is None:
+        graph = CoStarGraph.from_csv(directory)
+        try:
+            save_snapshot(graph, path, stamp)
+        except OSError:
+            # Loads from a read-only directory keep parsing the CSV files
+            pass
+    replay_journal(graph, directory)
+    return graph
+
+
+def read_delta(directory):
+    """
+    Yields ("person", id, name, birth), ("movie", id, title, year) and
+    ("star", person_id, movie_id) rows from whichever of people.csv,
+    movies.csv and stars.csv exist in `directory`, in that order.
+    """
+    columns = [
+        ("people.csv", "person", ("id", "name", "birth")),
+        ("movies.csv", "movie", ("id", "title", "year")),
+        ("stars.csv", "star", ("person_id", "movie_id")),
+    ]
+    for filename, kind, fields in columns:
+        path = os.path.join(directory, filename)
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                yield (kind, *(row[field] for field in fields))
+
+
+def apply_row(graph, row):
+    """
+    Merges one row from read_delta into `graph`.
+    """
+    kind, *fields = row
+    if kind == "person":
+        graph.add_person(*fields)
+    elif kind == "movie":
+        graph.add_movie(*fields)
+    elif kind == "star":
+        graph.add_star(*fields)
+
+
+def append_journal(directory, rows):
+    """
+    Appends delta rows to the journal next to the snapshot in `directory`,
+    so every later load_graph merges them without a rebuild.
+    """
+    with open(os.path.join(directory, JOURNAL), "a", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+
+
+def read_journal(directory):
+    """
+    Yields the rows recorded in the journal in `directory`, if any, in
+    the order they were appended.
+    """
+    try:
+        f = open(os.path.join(directory, JOURNAL), encoding="utf-8")
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def replay_journal(graph, directory):
+    """
+    Merges every row recorded in the journal in `directory` into `graph`.
+    Rows are idempotent, so replaying onto a rebuilt snapshot is safe.
+    """
+    for row in read_journal(directory):
+        apply_row(graph, row)
+
+
+def align(size):
+    return (size + 7) & ~7
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the degrees snapshot.")
+    parser.add_argument("directory")
+    parser.add_argument("--append", metavar="DELTA",
+                        help="journal the people, movies and stars CSVs in DELTA")
+    args = parser.parse_args()
+
+    if args.append:
+        append_journal(args.directory, read_delta(args.append))
+    else:
+        graph = load_graph(args.directory)
+        print(f"{graph.person_count()} people, {graph.movie_count()} movies")
+
+
+if __name__ == "__main__":
+    main()
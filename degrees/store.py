@@ -0,0 +1,334 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Mapping
+
+from snapshot import JOURNAL, read_delta, source_stamp
+from util import LRUCache
+
+VERSION = 2
+
+# Name of the SQLite file written next to the CSV files
+FILENAME = "degrees.sqlite"
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE people (id TEXT PRIMARY KEY, name TEXT, name_lower TEXT, birth TEXT) WITHOUT ROWID;
+CREATE TABLE movies (id TEXT PRIMARY KEY, title TEXT, year TEXT) WITHOUT ROWID;
+CREATE TABLE stars (
+    person_id TEXT, movie_id TEXT, PRIMARY KEY (person_id, movie_id)
+) WITHOUT ROWID;
+"""
+
+# Created after the bulk import, which is faster than maintaining them row by row
+INDEXES = """
+CREATE INDEX people_name ON people (name_lower);
+CREATE INDEX stars_movie ON stars (movie_id, person_id);
+CREATE INDEX movies_year ON movies (CAST(year AS INTEGER));
+"""
+
+# Rows inserted only if they are new, and stars only between known people and movies
+INSERTS = {
+    "person": "INSERT OR IGNORE INTO people VALUES (?, ?, ?, ?)",
+    "movie": "INSERT OR IGNORE INTO movies VALUES (?1, ?2, ?3)",
+    "star": """
+        INSERT OR IGNORE INTO stars SELECT ?1, ?2
+        WHERE EXISTS (SELECT 1 FROM people WHERE id = ?1)
+        AND EXISTS (SELECT 1 FROM movies WHERE id = ?2)
+    """,
+}
+
+
+def insert_rows(connection, rows):
+    """
+    Inserts ("person" | "movie" | "star", ...) rows from read_delta.
+    """
+    for kind, *fields in rows:
+        if kind == "person":
+            # SQLite's lower() only folds ASCII, so names are lowercased here
+            person_id, name, birth = fields
+            fields = (person_id, name, name.lower(), birth)
+        connection.execute(INSERTS[kind], fields)
+
+
+def build_store(directory, path, stamp):
+    """
+    Imports the CSV files in `directory`, and then its journal, into a
+    fresh SQLite file at `path` tagged with the source `stamp`.
+    """
+    temporary = f"{path}.tmp"
+    if os.path.exists(temporary):
+        os.unlink(temporary)
+    connection = sqlite3.connect(temporary)
+    try:
+        # The file is rebuilt from the CSVs if anything goes wrong, so skip durability
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.executescript(SCHEMA)
+        with connection:
+            insert_rows(connection, read_delta(directory))
+            connection.executescript(INDEXES)
+            connection.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ("version", str(VERSION)),
+                ("sources", json.dumps(stamp)),
+            ])
+        replay_journal(connection, directory)
+    finally:
+        connection.close()
+    os.replace(temporary, path)
+
+
+def replay_journal(connection, directory, start=0):
+    """
+    Inserts the rows recorded in the snapshot journal in `directory`
+    from byte `start` on, and records where they end in `meta`.
+    """
+    try:
+        f = open(os.path.join(directory, JOURNAL), "rb")
+    except FileNotFoundError:
+        return
+    with f, connection:
+        # A journal shorter than what was replayed has been rewritten
+        if os.fstat(f.fileno()).st_size < start:
+            start = 0
+        f.seek(start)
+        insert_rows(connection, (json.loads(line) for line in f if line.strip()))
+        connection.execute("INSERT OR REPLACE INTO meta VALUES ('journal', ?)", (str(f.tell()),))
+
+
+class Store():
+    """
+    Lazily queried SQLite copy of a degrees dataset.
+
+    Every thread and forked process opens its own connection. People,
+    movies and co-star sets are kept in small LRU caches, so memory use
+    depends on the cache sizes rather than on the dataset.
+    """
+
+    def __init__(self, path, cache_size=4096):
+        self.path = path
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.people = LRUCache(cache_size)
+        self.movies = LRUCache(cache_size)
+        self.neighbors_cache = LRUCache(cache_size)
+
+    @classmethod
+    def open(cls, path, stamp=None, cache_size=4096):
+        """
+        Returns a Store for the SQLite file at `path`, or None if it is
+        missing, was written by another version or does not match `stamp`.
+        """
+        if not os.path.exists(path):
+            return None
+        store = cls(path, cache_size)
+        try:
+            meta = dict(store.query("SELECT key, value FROM meta"))
+        except sqlite3.DatabaseError:
+            return None
+        if meta.get("version") != str(VERSION):
+            return None
+        if stamp is not None and json.loads(meta["sources"]) != stamp:
+            return None
+        return store
+
+    def connection(self):
+        """
+        Returns this thread's connection, reopening it after a fork.
+        """
+        local = self.local
+        if getattr(local, "pid", None) != os.getpid():
+            local.connection = sqlite3.connect(self.path)
+            local.pid = os.getpid()
+        return local.connection
+
+    def query(self, sql, parameters=()):
+        return self.connection().execute(sql, parameters).fetchall()
+
+    def cached(self, cache, key, load):
+        """
+        Returns `cache[key]`, calling `load(key)` to fill it on a miss.
+        """
+        with self.lock:
+            value = cache.get(key)
+        if value is None:
+            value = load(key)
+            with self.lock:
+                cache.put(key, value)
+        return value
+
+    def person(self, person_id):
+        """
+        Returns the dict layout degrees.people uses, or None.
+        """
+        return self.cached(self.people, person_id, self.load_person)
+
+    def load_person(self, person_id):
+        rows = self.query("SELECT name, birth FROM people WHERE id = ?", (person_id,))
+        if not rows:
+            return None
+        name, birth = rows[0]
+        movies = self.query("SELECT movie_id FROM stars WHERE person_id = ?", (person_id,))
+        return {"name": name, "birth": birth, "movies": {movie_id for (movie_id,) in movies}}
+
+    def movie(self, movie_id):
+        """
+        Returns the dict layout degrees.movies uses, or None.
+        """
+        return self.cached(self.movies, movie_id, self.load_movie)
+
+    def load_movie(self, movie_id):
+        rows = self.query("SELECT title, year FROM movies WHERE id = ?", (movie_id,))
+        if not rows:
+            return None
+        title, year = rows[0]
+        stars = self.query("SELECT person_id FROM stars WHERE movie_id = ?", (movie_id,))
+        return {"title": title, "year": year, "stars": {person_id for (person_id,) in stars}}
+
+    def neighbors(self, person_id):
+        """
+        Returns a frozenset of (movie_id, person_id) pairs for people
+        who starred with a given person.
+        """
+        return self.cached(self.neighbors_cache, person_id, self.load_neighbors)
+
+    def load_neighbors(self, person_id):
+        return frozenset(self.query("""
+            SELECT costar.movie_id, costar.person_id
+            FROM stars AS own JOIN stars AS costar ON costar.movie_id = own.movie_id
+            WHERE own.person_id = ?
+        """, (person_id,)))
+
+    def people_named(self, name):
+        """
+        Returns the set of IMDB ids of people whose lowercased name is `name`.
+        """
+        rows = self.query("SELECT id FROM people WHERE name_lower = ?", (name,))
+        return {person_id for (person_id,) in rows}
+
+    def movies_between(self, first, last):
+        """
+        Returns the set of IMDB ids of movies released from `first`
+        through `last`.
+        """
+        rows = self.query(
+            "SELECT id FROM movies WHERE CAST(year AS INTEGER) BETWEEN ? AND ?", (first, last)
+        )
+        return {movie_id for (movie_id,) in rows}
+
+    def append(self, rows):
+        """
+        Inserts delta rows, dropping cached entries they may change.
+        """
+        connection = self.connection()
+        with connection:
+            insert_rows(connection, rows)
+        with self.lock:
+            for cache in (self.people, self.movies, self.neighbors_cache):
+                cache.clear()
+
+
+class PeopleTable(Mapping):
+    """
+    Read-only `degrees.people` mapping backed by a Store.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, person_id):
+        person = self.store.person(person_id)
+        if person is None:
+            raise KeyError(person_id)
+        return person
+
+    def __contains__(self, person_id):
+        return bool(self.store.query("SELECT 1 FROM people WHERE id = ?", (person_id,)))
+
+    def __iter__(self):
+        return (person_id for (person_id,) in self.store.connection().execute("SELECT id FROM people"))
+
+    def __len__(self):
+        return self.store.query("SELECT count(*) FROM people")[0][0]
+
+
+class MoviesTable(Mapping):
+    """
+    Read-only `degrees.movies` mapping backed by a Store.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, movie_id):
+        movie = self.store.movie(movie_id)
+        if movie is None:
+            raise KeyError(movie_id)
+        return movie
+
+    def __contains__(self, movie_id):
+        return bool(self.store.query("SELECT 1 FROM movies WHERE id = ?", (movie_id,)))
+
+    def __iter__(self):
+        return (movie_id for (movie_id,) in self.store.connection().execute("SELECT id FROM movies"))
+
+    def __len__(self):
+        return self.store.query("SELECT count(*) FROM movies")[0][0]
+
+
+class NamesTable(Mapping):
+    """
+    Read-only `degrees.names` mapping backed by a Store.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, name):
+        person_ids = self.store.people_named(name)
+        if not person_ids:
+            raise KeyError(name)
+        return person_ids
+
+    def __iter__(self):
+        rows = self.store.connection().execute("SELECT DISTINCT name_lower FROM people ORDER BY name_lower")
+        return (name for (name,) in rows)
+
+    def __len__(self):
+        return self.store.query("SELECT count(DISTINCT name_lower) FROM people")[0][0]
+
+
+def load_store(directory, cache_size=4096):
+    """
+    Returns the Store for the CSV files in `directory`, importing them
+    into a fresh SQLite file first if it is missing or stale, and
+    inserting any rows journaled since it was last opened.
+    """
+    path = os.path.join(directory, FILENAME)
+    stamp = source_stamp(directory)
+    store = Store.open(path, stamp, cache_size)
+    if store is None:
+        build_store(directory, path, stamp)
+        store = Store.open(path, stamp, cache_size)
+    else:
+        # Rows appended through the compact backend only reach the journal
+        replayed = store.query("SELECT value FROM meta WHERE key = 'journal'")
+        replay_journal(store.connection(), directory, int(replayed[0][0]) if replayed else 0)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a degrees dataset into SQLite.")
+    parser.add_argument("directory")
+    args = parser.parse_args()
+
+    store = load_store(args.directory)
+    people = store.query("SELECT count(*) FROM people")[0][0]
+    movies = store.query("SELECT count(*) FROM movies")[0][0]
+    print(f"{people} people, {movies} movies")
+
+
+if __name__ == "__main__":
+    main()
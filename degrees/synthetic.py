@@ -0,0 +1,98 @@
+import argparse
+import csv
+import itertools
+import os
+import random
+
+# Syllables for generated names, so that some people share a name
+SYLLABLES = [
+    "al", "an", "ber", "bel", "cal", "car", "da", "dor", "el", "en", "fa",
+    "fin", "gar", "hol", "is", "jon", "ka", "kel", "la", "lin", "ma", "mar",
+    "mi", "na", "nor", "ol", "per", "ra", "ros", "sa", "sam", "ter", "tor",
+    "ul", "va", "ver", "wil", "yor", "zel",
+]
+
+
+def name(rng, words):
+    """
+    Returns a random capitalized name of `words` words.
+    """
+    return " ".join(
+        "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3))).capitalize()
+        for _ in range(words)
+    )
+
+
+def power_law(rng, exponent, minimum, maximum):
+    """
+    Returns an integer drawn from a Pareto distribution with the given
+    tail `exponent`, clipped to [minimum, maximum].
+    """
+    return min(int(minimum * rng.paretovariate(exponent - 1)), maximum)
+
+
+def generate(directory, stars, people=None, movies=None, exponent=2.1, seed=0):
+    """
+    Writes people.csv, movies.csv and stars.csv to `directory` with about
+    `stars` star links.
+
+    Cast sizes follow a power law, and each cast is drawn with weights
+    that also follow a power law, so a few hub actors appear in many
+    movies the way prolific actors do in IMDB.
+    """
+    rng = random.Random(seed)
+    people = people or max(stars // 4, 10)
+    movies = movies or max(stars // 10, 1)
+    os.makedirs(directory, exist_ok=True)
+
+    with open(os.path.join(directory, "people.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for person in range(people):
+            writer.writerow([person, name(rng, 2), rng.randint(1900, 2010)])
+
+    with open(os.path.join(directory, "movies.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for movie in range(movies):
+            writer.writerow([movie, name(rng, rng.randint(1, 4)), rng.randint(1920, 2024)])
+
+    # Popularity weight of each person, sampled through a cumulative table
+    weights = itertools.accumulate(rng.paretovariate(exponent - 1) for _ in range(people))
+    cumulative = list(weights)
+
+    # Spread the link budget over movies in proportion to power-law cast sizes
+    casts = [power_law(rng, exponent, 2, 500) for _ in range(movies)]
+    scale = stars / sum(casts)
+
+    with open(os.path.join(directory, "stars.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for movie, cast in enumerate(casts):
+            size = min(max(1, round(cast * scale)), people)
+
+            # Hubs are drawn again and again, so draw until the cast is full
+            members = set()
+            while len(members) < size:
+                members.update(rng.choices(range(people), cum_weights=cumulative, k=size - len(members)))
+            for person in members:
+                writer.writerow([person, movie])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic degrees dataset.")
+    parser.add_argument("directory")
+    parser.add_argument("--stars", type=int, default=10 ** 5,
+                        help="approximate number of star links (10^4 to 10^7)")
+    parser.add_argument("--people", type=int, help="number of people (default: stars / 4)")
+    parser.add_argument("--movies", type=int, help="number of movies (default: stars / 10)")
+    parser.add_argument("--exponent", type=float, default=2.1,
+                        help="power-law exponent for cast sizes and popularity")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate(args.directory, args.stars, args.people, args.movies, args.exponent, args.seed)
+
+
+if __name__ == "__main__":
+    main()
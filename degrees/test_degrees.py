@@ -0,0 +1,199 @@
+import csv
+import json
+import os
+import shutil
+import threading
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+import degrees
+import server
+from landmarks import load_landmarks
+from snapshot import append_journal, open_snapshot, read_delta
+from synthetic import generate
+
+SMALL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "small")
+
+
+def dataset(tmp_path):
+    """
+    Returns the path of a writable copy of the small dataset.
+    """
+    directory = tmp_path / "small"
+    shutil.copytree(SMALL, directory)
+    return str(directory)
+
+
+def write_delta(directory, people=(), movies=(), stars=()):
+    """
+    Writes delta CSV files with the given rows to `directory`.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for filename, header, rows in [
+        ("people.csv", ["id", "name", "birth"], people),
+        ("movies.csv", ["id", "title", "year"], movies),
+        ("stars.csv", ["person_id", "movie_id"], stars),
+    ]:
+        with open(os.path.join(directory, filename), "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+    return directory
+
+
+def ensemble_delta(directory, tmp_path):
+    """
+    Returns a delta casting everyone in `directory` in one new movie.
+    """
+    people = [row[1] for row in read_delta(directory) if row[0] == "person"]
+    return write_delta(str(tmp_path / "delta"), movies=[("900", "Ensemble", "2020")],
+                       stars=[(person_id, "900") for person_id in people])
+
+
+def test_landmarks_after_unjournaled_append(tmp_path):
+    directory = dataset(tmp_path)
+    degrees.load_data(directory, backend="compact", snapshot=False)
+    load_landmarks(degrees.graph, directory, 4)
+
+    rows = degrees.append_data(ensemble_delta(directory, tmp_path))
+    graph = degrees.graph
+    oracle = load_landmarks(graph, directory, 4, rows)
+    for source in range(graph.person_count()):
+        for target in range(graph.person_count()):
+            assert len(oracle.search(source, target)) == len(graph.search(source, target))
+
+
+def test_dict_backend_replays_journal(tmp_path):
+    directory = dataset(tmp_path)
+    append_journal(directory, read_delta(ensemble_delta(directory, tmp_path)))
+    for backend in ("dict", "compact", "sqlite"):
+        degrees.load_data(directory, backend=backend)
+        assert degrees.shortest_path("102", "914612") == [("900", "914612")]
+
+
+def test_name_index_without_room_for_matches():
+    degrees.load_data(SMALL)
+    index = degrees.name_index
+    assert index.fuzzy("tom cruse", limit=3) == [(1, "tom cruise")]
+    for limit in (0, -1):
+        assert index.fuzzy("tom cruse", limit=limit) == []
+        assert index.prefix("tom", limit=limit) == []
+
+
+def request(url, body=None):
+    """
+    Returns (status, JSON response) for a GET, or a POST of `body`.
+    """
+    try:
+        with urlopen(url, body) as response:
+            return response.status, json.load(response)
+    except HTTPError as error:
+        return error.code, json.load(error)
+
+
+def test_server_rejects_malformed_parameters(tmp_path):
+    degrees.load_data(dataset(tmp_path), backend="compact")
+    httpd = server.make_server(("127.0.0.1", 0))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    try:
+        for body in (b"[1]", b'"x"', b'{"q": 5}', b'{"q": "tom", "limit": [1]}'):
+            assert request(f"{url}/names", body)[0] == 400
+        assert request(f"{url}/path", b'{"source": 102, "target": "158"}')[0] == 400
+        for limit in (0, -1, "x"):
+            assert request(f"{url}/names?q=tom&limit={limit}")[0] == 400
+        status, response = request(f"{url}/names?q=tom&limit=1000")
+        assert status == 200 and len(response["people"]) <= server.MAX_LIMIT
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_cheapest_path_honors_movie_constraints(tmp_path):
+    directory = dataset(tmp_path)
+    delta = write_delta(str(tmp_path / "delta"), movies=[("901", "Reunion", "2021")],
+                        stars=[("102", "901"), ("158", "901")])
+    for backend in ("dict", "compact", "sqlite"):
+        degrees.load_data(directory, backend=backend)
+        degrees.append_data(delta)
+        for constraints, movie_id in [
+            ({"deny": ["901"]}, "112384"),
+            ({"years": (1990, 2000)}, "112384"),
+            ({"allow": ["901"]}, "901"),
+        ]:
+            path = degrees.astar("102", "158", degrees.recency_cost, min_cost=1, **constraints)
+            assert path == [(movie_id, "158")]
+
+
+def test_use_landmarks_matches_plain_search(tmp_path):
+    directory = dataset(tmp_path)
+    degrees.load_data(directory, backend="dict")
+    with pytest.raises(ValueError):
+        degrees.use_landmarks(directory, 4)
+
+    degrees.load_data(directory, backend="compact")
+    person_ids = list(degrees.people)
+    expected = {(s, t): degrees.shortest_path(s, t) for s in person_ids for t in person_ids}
+    degrees.use_landmarks(directory, 4)
+    assert degrees.oracle is not None
+    for (source, target), path in expected.items():
+        found = degrees.shortest_path(source, target)
+        assert (found is None) == (path is None)
+        assert found is None or len(found) == len(path)
+
+
+def test_snapshot_round_trip(tmp_path):
+    directory = dataset(tmp_path)
+    degrees.load_data(directory, backend="compact", snapshot=False)
+    person_ids = list(degrees.people)
+    expected = {(s, t): degrees.shortest_path(s, t) for s in person_ids for t in person_ids}
+
+    # The first load writes the snapshot and the second maps it back
+    for _ in range(2):
+        degrees.load_data(directory, backend="compact")
+        assert open_snapshot(os.path.join(directory, "degrees.snapshot")) is not None
+        for (source, target), path in expected.items():
+            assert degrees.shortest_path(source, target) == path
+
+
+def test_store_replays_journal_tail(tmp_path):
+    directory = dataset(tmp_path)
+    degrees.load_data(directory, backend="sqlite")
+    assert degrees.shortest_path("102", "914612") is None
+
+    # Rows journaled by the compact backend reach the existing SQLite file
+    degrees.load_data(directory, backend="compact")
+    degrees.append_data(ensemble_delta(directory, tmp_path), journal=directory)
+    for _ in range(2):
+        degrees.load_data(directory, backend="sqlite")
+        assert degrees.shortest_path("102", "914612") == [("900", "914612")]
+
+
+def test_neighbor_cache_sees_appended_rows(tmp_path):
+    degrees.cache_neighbors(1 << 20)
+    try:
+        degrees.load_data(SMALL)
+        assert degrees.shortest_path("102", "914612") is None
+        degrees.append_data(ensemble_delta(SMALL, tmp_path))
+        assert degrees.shortest_path("102", "914612") == [("900", "914612")]
+        assert degrees.neighbor_cache.stats()["misses"] > 0
+    finally:
+        degrees.cache_neighbors(0)
+
+
+def test_switching_backends(tmp_path):
+    directory = dataset(tmp_path)
+    for backend in ("compact", "sqlite", "dict", "sqlite", "compact", "dict"):
+        degrees.load_data(directory, backend=backend)
+        assert (degrees.graph is not None) == (backend == "compact")
+        assert (degrees.store is not None) == (backend == "sqlite")
+        assert degrees.shortest_path("102", "129") == [("104257", "129")]
+
+
+def test_synthetic_casts_reach_star_count(tmp_path):
+    generate(str(tmp_path), 20000)
+    with open(tmp_path / "stars.csv", encoding="utf-8") as f:
+        stars = sum(1 for _ in csv.DictReader(f))
+    assert abs(stars - 20000) < 1000
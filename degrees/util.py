@@ -1,8 +1,16 @@
+import heapq
+import itertools
+from collections import OrderedDict, deque
+
+
 class Node():
-    def __init__(self, state, parent, action):
+    __slots__ = ("state", "parent", "action", "cost")
+
+    def __init__(self, state, parent, action, cost=0):
         self.state = state
         self.parent = parent
         self.action = action
+        self.cost = cost
 
 
 class StackFrontier():
@@ -36,3 +44,168 @@ class QueueFrontier(StackFrontier):
             node = self.frontier[0]
             self.frontier = self.frontier[1:]
             return node
+
+
+class DequeStackFrontier():
+    """
+    Stack frontier backed by a deque, with a count of the states it
+    holds so that add, remove and contains_state are all O(1).
+    """
+
+    def __init__(self):
+        self.frontier = deque()
+        self.states = {}
+
+    def __len__(self):
+        return len(self.frontier)
+
+    def add(self, node):
+        self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
+
+    def contains_state(self, state):
+        return state in self.states
+
+    def empty(self):
+        return len(self.frontier) == 0
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        node = self.pop()
+        count = self.states[node.state] - 1
+        if count:
+            self.states[node.state] = count
+        else:
+            del self.states[node.state]
+        return node
+
+    def pop(self):
+        return self.frontier.pop()
+
+
+class DequeQueueFrontier(DequeStackFrontier):
+
+    def pop(self):
+        return self.frontier.popleft()
+
+
+class PriorityFrontier():
+    """
+    Frontier on a binary heap that removes the node with the lowest
+    priority first, with O(log n) add and remove and O(1) contains_state.
+
+    Adding a state again with a lower priority replaces its node
+    (decrease-key). The outdated heap entry is left in place and skipped
+    when it reaches the top, rather than searched for and removed.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.entries = {}
+
+        # Breaks priority ties in insertion order, so nodes are never compared
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, node, priority):
+        """
+        Adds `node` unless its state is already queued with a priority no
+        higher than `priority`. Returns True if the node was added.
+        """
+        entry = self.entries.get(node.state)
+        if entry is not None and entry[0] <= priority:
+            return False
+        entry = (priority, next(self.counter), node)
+        self.entries[node.state] = entry
+        heapq.heappush(self.heap, entry)
+        return True
+
+    def contains_state(self, state):
+        return state in self.entries
+
+    def priority(self, state):
+        """
+        Returns the priority `state` is queued with, or None.
+        """
+        entry = self.entries.get(state)
+        return None if entry is None else entry[0]
+
+    def empty(self):
+        return len(self.entries) == 0
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        while True:
+            entry = heapq.heappop(self.heap)
+            node = entry[2]
+            if self.entries.get(node.state) is entry:
+                del self.entries[node.state]
+                return node
+
+
+class LRUCache():
+    """
+    Bounded mapping that evicts the least recently used entries,
+    counting hits and misses.
+
+    Each entry costs `weigh(value)` against `capacity`, or 1 if no
+    `weigh` function is given.
+    """
+
+    def __init__(self, capacity, weigh=None):
+        self.capacity = capacity
+        self.weigh = weigh
+        self.entries = OrderedDict()
+        self.weights = {}
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        if key not in self.entries:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, value):
+        weight = 1 if self.weigh is None else self.weigh(value)
+        if weight > self.capacity:
+            return
+        if key in self.entries:
+            self.weight -= self.weights[key]
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        self.weights[key] = weight
+        self.weight += weight
+        while self.weight > self.capacity:
+            evicted, _ = self.entries.popitem(last=False)
+            self.weight -= self.weights.pop(evicted)
+
+    def clear(self):
+        """
+        Drops every entry, keeping the hit and miss counts.
+        """
+        self.entries.clear()
+        self.weights.clear()
+        self.weight = 0
+
+    def stats(self):
+        return {
+            "size": len(self.entries),
+            "weight": self.weight,
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
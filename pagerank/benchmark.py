@@ -0,0 +1,154 @@
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import crawler
+from ondisk import EdgeFile, ondisk_power_iteration, write_corpus
+from pagerank import DAMPING
+from sampling import Z95, sample_parallel
+from solvers import SOLVERS
+from sparse import TOLERANCE, TransitionMatrix
+
+
+def peak_rss():
+    """
+    Returns the peak resident set size of this process in megabytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def benchmark_crawl(directory):
+    """
+    Returns (corpus, timings) after crawling `directory` without the
+    link cache, then filling the cache and crawling again from it.
+    """
+    timings = {}
+    start = time.perf_counter()
+    corpus = crawler.crawl(directory, cache=False)
+    timings["cold"] = time.perf_counter() - start
+
+    crawler.crawl(directory)
+    start = time.perf_counter()
+    crawler.crawl(directory)
+    timings["cached"] = time.perf_counter() - start
+    return corpus, timings
+
+
+def measure(solver, *args, **kwargs):
+    """
+    Returns (result, seconds, megabytes) for calling `solver`, where
+    megabytes is the peak memory it allocated on top of what it was given.
+
+    Tracing slows every allocation, and solvers that allocate more per
+    iteration more so, so the time comes from a separate untraced call.
+    """
+    start = time.perf_counter()
+    result = solver(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    solver(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / (1024 * 1024)
+
+
+def benchmark_solvers(matrix, tolerance, names):
+    """
+    Returns {solver: {"iterations", "seconds", "memory", "residual",
+    "ranks"}} for each named solver in SOLVERS reaching `tolerance`.
+    """
+    results = {}
+    for name in names:
+        (ranks, iterations, residual), seconds, memory = measure(
+            SOLVERS[name], matrix, DAMPING, tolerance
+        )
+        results[name] = {
+            "iterations": iterations, "seconds": seconds, "memory": memory,
+            "residual": residual, "ranks": ranks,
+        }
+    return results
+
+
+def benchmark_ondisk(corpus, tolerance):
+    """
+    Returns the same measurements as benchmark_solvers for the on-disk
+    solver, over an edge file written to a temporary directory.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "graph.bin")
+        write_corpus(corpus, path)
+        graph = EdgeFile(path)
+        (ranks, iterations, residual), seconds, memory = measure(
+            ondisk_power_iteration, graph, DAMPING, tolerance
+        )
+    return {"iterations": iterations, "seconds": seconds, "memory": memory,
+            "residual": residual, "ranks": ranks}
+
+
+def agreement(ranks, reference, errors):
+    """
+    Returns (L1 distance, largest difference, fraction of pages whose
+    95% confidence interval holds the reference) between sampled `ranks`
+    with standard `errors` and the `reference` ranks.
+    """
+    difference = np.abs(ranks - reference)
+    covered = difference <= Z95 * errors
+    return difference.sum(), difference.max(), covered.mean()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for pagerank.")
+    parser.add_argument("corpus", help="directory of HTML pages, e.g. one written by synthetic.py")
+    parser.add_argument("--solvers", nargs="+", choices=list(SOLVERS), default=list(SOLVERS))
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--samples", type=int, default=10 ** 6,
+                        help="samples for the sampling comparison, 0 to skip it")
+    parser.add_argument("--processes", type=int, help="worker processes for sampling")
+    parser.add_argument("--ondisk", action="store_true", help="also time the on-disk solver")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus, timings = benchmark_crawl(args.corpus)
+    links = sum(len(links) for links in corpus.values())
+    print(f"{args.corpus} ({len(corpus)} pages, {links} links)")
+    print(f"  crawl: {timings['cold']:.3f}s cold, {timings['cached']:.3f}s cached")
+
+    start = time.perf_counter()
+    matrix = TransitionMatrix.from_corpus(corpus)
+    print(f"  matrix: {time.perf_counter() - start:.3f}s")
+
+    results = benchmark_solvers(matrix, args.tolerance, args.solvers)
+    if args.ondisk:
+        results["ondisk"] = benchmark_ondisk(corpus, args.tolerance)
+    reference = results[args.solvers[0]]["ranks"]
+    for name, stats in results.items():
+        print(f"  {name}: {stats['iterations']} iterations, {stats['seconds']:.3f}s, "
+              f"{stats['memory']:.1f} MB, residual {stats['residual']:.1e}, "
+              f"L1 from {args.solvers[0]} {np.abs(stats['ranks'] - reference).sum():.1e}")
+
+    if args.samples:
+        start = time.perf_counter()
+        ranks, errors, samples = sample_parallel(
+            corpus, DAMPING, args.samples, args.processes, args.seed
+        )
+        elapsed = time.perf_counter() - start
+        sampled = np.array([ranks[page] for page in matrix.pages])
+        errors = np.array([errors[page] for page in matrix.pages])
+        distance, largest, covered = agreement(sampled, reference, errors)
+        print(f"  sampling: {samples} samples, {elapsed:.3f}s, L1 {distance:.3f}, "
+              f"largest difference {largest:.2e}, {covered:.1%} within 95% CI")
+    print(f"  peak RSS: {peak_rss():.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
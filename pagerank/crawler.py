@@ -0,0 +1,162 @@
+import html
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# Name of the link cache written inside the corpus directory
+CACHE = ".links.json"
+VERSION = 1
+
+# Bytes fed to the tokenizer at a time
+CHUNK = 1 << 16
+
+# Below this many files to parse, a pool costs more than it saves
+POOL_THRESHOLD = 256
+
+# An <a> start tag, and the href attribute within one
+ANCHOR = re.compile(r"<a\s[^>]*>", re.IGNORECASE)
+HREF = re.compile(
+    r"""\shref\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""", re.IGNORECASE
+)
+
+
+class LinkParser():
+    """
+    Streaming tokenizer that collects the href of every <a> tag.
+
+    Text is fed in pieces of any size. Only start tags are tokenized,
+    and a tag cut off at the end of a piece is kept until the next one.
+    """
+
+    def __init__(self):
+        self.links = set()
+        self.pending = ""
+
+    def feed(self, text):
+        text = self.pending + text
+        end = 0
+        for tag in ANCHOR.finditer(text):
+            href = HREF.search(tag.group())
+            if href is not None:
+                double, single, bare = href.groups()
+                self.links.add(html.unescape(next(v for v in (double, single, bare) if v is not None)))
+            end = tag.end()
+
+        # Hold back anything from an unclosed "<" onwards
+        start = text.rfind("<", end)
+        self.pending = text[start:] if start != -1 and text.find(">", start) == -1 else ""
+
+    def close(self):
+        self.pending = ""
+
+
+def parse_links(path):
+    """
+    Returns the set of hrefs of the <a> tags in the HTML file at `path`,
+    read and tokenized a chunk at a time.
+    """
+    parser = LinkParser()
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while chunk := f.read(CHUNK):
+            parser.feed(chunk)
+    parser.close()
+    return parser.links
+
+
+def stamp(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def load_cache(directory):
+    """
+    Returns {filename: {"stamp": [size, mtime], "links": [...]}} from
+    the cache in `directory`, or {} if it is missing or unreadable.
+    """
+    try:
+        with open(os.path.join(directory, CACHE), encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get("version") != VERSION:
+        return {}
+    return cache["pages"]
+
+
+def save_cache(directory, pages):
+    """
+    Writes the cache for `directory`, replacing any previous one whole.
+    """
+    path = os.path.join(directory, CACHE)
+    temporary = f"{path}.tmp"
+    try:
+        with open(temporary, "w", encoding="utf-8") as f:
+            # dumps runs the C encoder, which dump's streaming cannot use
+            f.write(json.dumps({"version": VERSION, "pages": pages}))
+        os.replace(temporary, path)
+    except OSError:
+        # Without write access to the corpus every crawl parses the pages again
+        pass
+
+
+def crawl(directory, workers=None, cache=True):
+    """
+    Parse a directory of HTML pages and check for links to other pages,
+    as `pagerank.crawl` does.
+
+    Files whose size and modification time match the link cache are
+    not read again. The rest are parsed by a pool of `workers`
+    processes (default: one per core) when there are enough of them to
+    be worth it.
+    """
+    filenames = [name for name in os.listdir(directory) if name.endswith(".html")]
+    cached = load_cache(directory) if cache else {}
+
+    entries = {}
+    stale = []
+    for filename in filenames:
+        current = stamp(os.path.join(directory, filename))
+        entry = cached.get(filename)
+        if entry is not None and entry["stamp"] == current:
+            entries[filename] = entry
+        else:
+            entries[filename] = {"stamp": current}
+            stale.append(filename)
+
+    paths = [os.path.join(directory, filename) for filename in stale]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if len(paths) >= POOL_THRESHOLD and workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            parsed = pool.map(parse_links, paths, chunksize=64)
+            for filename, links in zip(stale, parsed):
+                entries[filename]["links"] = sorted(links)
+    else:
+        for filename, path in zip(stale, paths):
+            entries[filename]["links"] = sorted(parse_links(path))
+
+    if cache and (stale or len(cached) != len(entries)):
+        save_cache(directory, entries)
+
+    # Only include links to other pages in the corpus
+    names = entries.keys()
+    pages = {}
+    for filename, entry in entries.items():
+        links = names & entry["links"]
+        links.discard(filename)
+        pages[filename] = links
+    return pages
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python crawler.py corpus")
+    pages = crawl(sys.argv[1])
+    links = sum(len(links) for links in pages.values())
+    print(f"{len(pages)} pages, {links} links")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import argparse
+import time
+from itertools import repeat
+
+import numpy as np
+
+from pagerank import DAMPING, crawl
+from sampling import OutLinks
+from sparse import TOLERANCE, sparse_pagerank
+
+# Each round pushes only the pages holding at least this fraction of the
+# largest residual, so the bulk of the correction moves first
+PUSH_FRACTION = 0.05
+
+# Rounds with fewer links than 1/SPARSE of the pages scatter into the
+# residual directly rather than through a full-length bincount
+SPARSE = 16
+
+
+def diff_corpus(old, new):
+    """
+    Returns {page: (old_links, new_links)} for every page added, removed
+    or re-linked between two corpora as returned by `crawl`, with None
+    on the side a page is missing from.
+    """
+    diff = {}
+    for page in old.keys() | new.keys():
+        old_links, new_links = old.get(page), new.get(page)
+        if old_links != new_links:
+            diff[page] = (old_links, new_links)
+    return diff
+
+
+def push(links, estimate, residual, damping_factor, threshold, total_threshold=0):
+    """
+    Returns (estimate, rounds, pushes) after pushing `residual` through
+    `links` until no page holds more than `threshold` of it, or all
+    pages together hold no more than `total_threshold`.
+
+    `estimate` solves y = 1 + damping_factor * (y spread over links)
+    up to `residual`. Each round, the pages with the most residual move
+    it into their estimate and pass a damped share of it on to each page
+    they link to, so work goes where the correction is rather than to
+    every page. Both arrays are updated in place.
+    """
+    rounds = pushes = 0
+    while True:
+        size = np.abs(residual)
+        largest = size.max(initial=0)
+        if largest <= threshold or size.sum() <= total_threshold:
+            break
+        active = np.flatnonzero(size >= max(threshold, PUSH_FRACTION * largest))
+        mass = residual[active]
+        estimate[active] += mass
+        residual[active] = 0
+        rounds += 1
+        pushes += len(active)
+
+        # Every link out of an active page, as an index into links.targets
+        counts = links.degrees[active]
+        total = int(counts.sum())
+        if total == 0:
+            continue
+        starts = links.offsets[active] - np.cumsum(counts) + counts
+        targets = links.targets[np.repeat(starts, counts) + np.arange(total)]
+        shares = np.repeat(damping_factor * mass / np.maximum(counts, 1), counts)
+        if total * SPARSE < len(residual):
+            np.add.at(residual, targets, shares)
+        else:
+            residual += np.bincount(targets, shares, minlength=len(residual))
+    return estimate, rounds, pushes
+
+
+def warm_start(links, ranks, diff, damping_factor):
+    """
+    Returns (estimate, residual, scale) to `push` from, for the corpus
+    in `links` given the `ranks` of the corpus it was before the changes
+    in `diff` (see diff_corpus).
+
+    The previous ranks times `scale` solve y = 1 + d * (y spread over
+    links) for the previous corpus; pages without links simply lose
+    their share, which normalizes to the same PageRank. Against that
+    estimate, `diff` only leaves residual at added pages and at pages
+    whose incoming links changed.
+    """
+    previous = np.fromiter(map(ranks.get, links.pages, repeat(0)), dtype=float, count=len(links))
+
+    # Rank held by pages without links before the changes
+    old_dangling = previous[links.degrees == 0].sum()
+    for page, (old_links, new_links) in diff.items():
+        if new_links is not None and not new_links:
+            old_dangling -= ranks.get(page, 0)
+        if old_links is not None and not old_links:
+            old_dangling += ranks.get(page, 0)
+    scale = len(ranks) / ((1 - damping_factor) + damping_factor * old_dangling)
+
+    estimate = scale * previous
+    residual = np.zeros(len(links))
+
+    # Added pages start from nothing, and links that moved take their share along
+    for page, (old_links, new_links) in diff.items():
+        if old_links is None:
+            residual[links.position(page)] += 1
+        rank = scale * ranks.get(page, 0)
+        if rank == 0:
+            continue
+        for linked_page in old_links or ():
+            i = links.position(linked_page)
+            if i is not None:
+                residual[i] -= damping_factor * rank / len(old_links)
+        for linked_page in new_links or ():
+            residual[links.position(linked_page)] += damping_factor * rank / len(new_links)
+    return estimate, residual, scale
+
+
+def incremental_update(links, ranks, diff, damping_factor, tolerance=TOLERANCE):
+    """
+    Returns (ranks, rounds, pushes): the rank vector for the corpus in
+    `links` after the changes in `diff`, warm-started from its previous
+    `ranks`, and the push rounds and page pushes it took.
+    """
+    estimate, residual, scale = warm_start(links, ranks, diff, damping_factor)
+
+    # Leaves at most `tolerance` of residual in total once normalized
+    estimate, rounds, pushes = push(
+        links, estimate, residual, damping_factor, tolerance * scale / len(links), tolerance * scale
+    )
+    return estimate / estimate.sum(), rounds, pushes
+
+
+def update_pagerank(corpus, ranks, diff, damping_factor, tolerance=TOLERANCE, links=None):
+    """
+    Return PageRank values for each page as `iterate_pagerank` does,
+    given the `ranks` of the corpus before the changes in `diff`, by
+    pushing corrections out from the pages the changes affect.
+
+    `links` can be the OutLinks of the corpus before the changes. It is
+    patched in place to match `corpus`, so passing it to every update
+    saves building the whole table each time.
+    """
+    if links is None:
+        links = OutLinks.from_corpus(corpus)
+    else:
+        links.patch(corpus, diff)
+    vector, _, _ = incremental_update(links, ranks, diff, damping_factor, tolerance)
+    return dict(zip(links.pages, vector.tolist()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update PageRank after a corpus changes.")
+    parser.add_argument("old", help="corpus the previous ranks were computed for")
+    parser.add_argument("new", help="corpus after the changes")
+    args = parser.parse_args()
+
+    old, new = crawl(args.old), crawl(args.new)
+    ranks = sparse_pagerank(old, DAMPING)
+    diff = diff_corpus(old, new)
+    links = OutLinks.from_corpus(new)
+
+    start = time.perf_counter()
+    vector, rounds, pushes = incremental_update(links, ranks, diff, DAMPING)
+    elapsed = time.perf_counter() - start
+    print(f"PageRank Results from Incremental Update ({len(diff)} pages changed, "
+          f"{pushes} pushes in {rounds} rounds, {elapsed:.3f}s)")
+    for page, rank in zip(links.pages, vector.tolist()):
+        print(f"  {page}: {rank:.4f}")
+
+
+if __name__ == "__main__":
+    main()
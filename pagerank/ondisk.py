@@ -0,0 +1,184 @@
+import argparse
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from crawler import POOL_THRESHOLD, parse_links
+from pagerank import DAMPING
+from sparse import MAX_ITERATIONS, TOLERANCE
+
+# File layout: this header, then pages + 1 int64 offsets, then an int32
+# target per link grouped by source page, then the page names
+MAGIC = b"PRGRAPH1"
+HEADER = struct.Struct("<8sQQQ")
+
+# Links written, and read during an iteration, at a time
+BLOCK = 1 << 22
+
+
+def write_graph(path, pages, links):
+    """
+    Writes an edge file at `path` for `pages`, given an iterable
+    yielding the set of pages linked to by each of them in turn.
+    Links to pages outside `pages` and to the page itself are dropped.
+
+    Links are written BLOCK at a time, so memory stays O(pages).
+    """
+    index = {page: i for i, page in enumerate(pages)}
+    offsets = np.zeros(len(pages) + 1, dtype=np.int64)
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        # Header and offsets are filled in once the link count is known
+        f.seek(HEADER.size + offsets.nbytes)
+        count = written = 0
+        pending = []
+        for i, page_links in zip(range(len(pages)), links):
+            targets = sorted(index[link] for link in page_links if link in index and index[link] != i)
+            pending.extend(targets)
+            count += len(targets)
+            offsets[i + 1] = count
+            written += 1
+            if len(pending) >= BLOCK:
+                np.array(pending, dtype=np.int32).tofile(f)
+                pending = []
+        np.array(pending, dtype=np.int32).tofile(f)
+        if written != len(pages):
+            raise ValueError("Expected links for every page")
+
+        names = f.tell()
+        f.write("\n".join(pages).encode("utf-8"))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, len(pages), count, names))
+        offsets.tofile(f)
+    os.replace(temporary, path)
+
+
+def write_corpus(corpus, path):
+    """
+    Writes an edge file at `path` for a corpus as returned by `crawl`.
+    """
+    pages = sorted(corpus)
+    write_graph(path, pages, (corpus[page] for page in pages))
+
+
+def write_directory(directory, path, workers=None):
+    """
+    Writes an edge file at `path` for the HTML pages in `directory`,
+    parsing them as `crawler.crawl` does but without ever holding the
+    whole link graph.
+    """
+    pages = sorted(name for name in os.listdir(directory) if name.endswith(".html"))
+    paths = [os.path.join(directory, page) for page in pages]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if len(paths) >= POOL_THRESHOLD and workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            write_graph(path, pages, pool.map(parse_links, paths, chunksize=64))
+    else:
+        write_graph(path, pages, map(parse_links, paths))
+
+
+class EdgeFile():
+    """
+    Memory-mapped edge file: page `i` links to pages
+    `targets[offsets[i]:offsets[i + 1]]`, read from disk on demand.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            magic, pages, links, names = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"Not an edge file: {path}")
+            f.seek(names)
+            self.pages = f.read().decode("utf-8").split("\n") if pages else []
+        self.offsets = np.memmap(path, dtype=np.int64, mode="r", offset=HEADER.size, shape=(pages + 1,))
+        self.targets = np.memmap(
+            path, dtype=np.int32, mode="r", offset=HEADER.size + self.offsets.nbytes, shape=(links,)
+        ) if links else np.empty(0, dtype=np.int32)
+        self.degrees = np.diff(self.offsets)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def blocks(self, size=BLOCK):
+        """
+        Returns a list of (first, last) page ranges whose links add up
+        to about `size`.
+        """
+        starts = np.searchsorted(self.offsets, np.arange(0, self.offsets[-1], size), side="right") - 1
+        bounds = np.append(np.unique(starts), len(self.pages))
+        return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+    def multiply(self, ranks, blocks):
+        """
+        Returns the rank each page receives through links from pages
+        with `ranks`, leaving out dangling pages, reading the links one
+        block at a time.
+        """
+        shares = np.divide(ranks, self.degrees, out=np.zeros(len(ranks)), where=self.degrees > 0)
+        received = np.zeros(len(ranks))
+        for first, last in blocks:
+            targets = self.targets[self.offsets[first]:self.offsets[last]]
+            weights = np.repeat(shares[first:last], self.degrees[first:last])
+            received += np.bincount(targets, weights, minlength=len(ranks))
+        return received
+
+
+def ondisk_power_iteration(graph, damping_factor, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS,
+                           callback=None, block=BLOCK):
+    """
+    Returns (ranks, iterations, residual) as sparse.power_iteration does,
+    streaming the links of `graph` from disk `block` links at a time,
+    so only vectors with one entry per page stay in memory.
+    """
+    start = time.perf_counter()
+    n = len(graph)
+    blocks = graph.blocks(block)
+    dangling = graph.degrees == 0
+    ranks = np.full(n, 1 / n)
+
+    residual = np.inf
+    iterations = 0
+    while residual >= tolerance and iterations < max_iterations:
+        received = graph.multiply(ranks, blocks)
+        new_ranks = (1 - damping_factor) / n + damping_factor * (received + ranks[dangling].sum() / n)
+        residual = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        iterations += 1
+        if callback is not None:
+            callback(iterations, residual, time.perf_counter() - start)
+    return ranks, iterations, residual
+
+
+def ondisk_pagerank(path, damping_factor, tolerance=TOLERANCE):
+    """
+    Return PageRank values for each page of the edge file at `path`
+    as `iterate_pagerank` does.
+    """
+    graph = EdgeFile(path)
+    ranks, _, _ = ondisk_power_iteration(graph, damping_factor, tolerance)
+    return dict(zip(graph.pages, ranks.tolist()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PageRank over an on-disk edge file.")
+    parser.add_argument("graph", help="edge file to rank")
+    parser.add_argument("--corpus", help="crawl this directory into the edge file first")
+    parser.add_argument("--top", type=int, default=10, help="pages to show")
+    args = parser.parse_args()
+
+    if args.corpus:
+        write_directory(args.corpus, args.graph)
+    graph = EdgeFile(args.graph)
+    ranks, iterations, residual = ondisk_power_iteration(graph, DAMPING)
+    print(f"PageRank Results from {len(graph)} pages on disk "
+          f"({iterations} iterations, residual {residual:.2e})")
+    for i in np.argsort(-ranks, kind="stable")[:args.top]:
+        print(f"  {graph.pages[i]}: {ranks[i]:.4f}")
+
+
+if __name__ == "__main__":
+    main()
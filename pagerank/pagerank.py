@@ -1,7 +1,8 @@
-import os
 import random
-import re
 import sys
+import time
+
+import crawler
 
 DAMPING = 0.85
 SAMPLES = 10000
@@ -26,26 +27,11 @@ def crawl(directory):
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
-    """
-    pages = dict()
-
-    # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
 
-    # Only include links to other pages in the corpus
-    for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
-        )
-
-    return pages
+    Parsed links are cached in the directory, so only pages changed
+    since the last crawl are read again.
+    """
+    return crawler.crawl(directory)
 
 
 def transition_model(corpus, page, damping_factor):
@@ -86,65 +72,65 @@ def transition_model(corpus, page, damping_factor):
     return probabilities
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def sample_pagerank(corpus, damping_factor, n, walkers=None, seed=None, processes=None):
     """
     Return PageRank values for each page by sampling `n` pages
     according to the transition model, starting with a page at random.
 
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1).
-    """
 
-    # Create a dictionary to store PageRank values
-    pagerank = {page: 0 for page in corpus}
-
-    # Create a list to store samples
-    samples = []
+    With `walkers`, that many surfers are advanced together with NumPy,
+    and with `processes` the samples are also split across that many
+    worker processes. A `seed` makes the samples reproducible.
+    """
+    if n < 1:
+        raise ValueError("Sampling needs at least one sample")
+    if processes is not None:
+        from sampling import WALKERS, sample_parallel
+        ranks, _, _ = sample_parallel(corpus, damping_factor, n, processes, seed,
+                                      walkers=walkers or WALKERS)
+        return ranks
+    if walkers is not None:
+        from sampling import sample_walkers
+        return sample_walkers(corpus, damping_factor, n, walkers, seed)
+
+    pages, links = link_tables(corpus)
+    counts = [0] * len(pages)
+    total_pages = len(pages)
+    generator = random if seed is None else random.Random(seed)
+    random_number, random_page = generator.random, generator.randrange
 
     # Pick the first sample randomly
-    initial_sample = random.choice(list(corpus.keys()))
-
-    # Store the first sample
-    samples.append(initial_sample)
+    page = random_page(total_pages)
+    counts[page] += 1
 
-    # For each remaining sample
+    # Every next page is either a link picked uniformly or any page picked
+    # uniformly, so each step is one or two random draws and an index
     for i in range(n - 1):
-        # Use the transition model function to get the probabilities for the next sample
-        transition_probabilities = transition_model(corpus, initial_sample, damping_factor)
-
-        # Generate a random number between 0 and 1 to represent the stochastic behavior
-        random_number = random.uniform(0, 1)
-
-        # Initialize a cumulative probability counter
-        cumulative_probability = 0
-
-        # Iterate through the pages and their probabilities
-        for page, probability in transition_probabilities.items():
-            # Update the cumulative_probability by adding the current probability
-            cumulative_probability += probability
-
-            # Check if the random number falls in the cumulative_probability range and select the next page
-            if random_number <= cumulative_probability:
-                next_sample = page
-                break  # Exit the loop once the next page is selected
-
-        # Append the next sample to the list of samples
-        samples.append(next_sample)
-
-        # Update the PageRank value for the selected page
-        pagerank[next_sample] += 1
-
-        # Update the initial sample for the next iteration
-        initial_sample = next_sample
+        page_links = links[page]
+        if page_links and random_number() < damping_factor:
+            page = page_links[random_page(len(page_links))]
+        else:
+            page = random_page(total_pages)
+        counts[page] += 1
 
     # Normalize the PageRank values by dividing them by the total number of samples
-    total_samples = len(samples)
-    pagerank = {page: rank / total_samples for page, rank in pagerank.items()}
+    return {page: count / n for page, count in zip(pages, counts)}
 
-    return pagerank
+
+def link_tables(corpus):
+    """
+    Return the pages of the corpus as a list, and for each of them a
+    tuple of the indices of the pages it links to.
+    """
+    pages = list(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    links = [tuple(index[link] for link in sorted(corpus[page])) for page in pages]
+    return pages, links
 
 
-def iterate_pagerank(corpus, damping_factor):
+def iterate_pagerank(corpus, damping_factor, threshold=None, solver=None, callback=None):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -152,13 +138,33 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    With NumPy, iteration stops once the ranks change by less than
+    `threshold` in total, using the named `solver` (see solvers.SOLVERS),
+    and otherwise once no page changes by more than `threshold`. If
+    given, `callback(iteration, residual, elapsed)` is called after
+    every iteration with the total change and the seconds elapsed.
     """
 
+    # Use the sparse matrix solvers when NumPy is available
+    try:
+        from solvers import solve_pagerank
+        from sparse import TOLERANCE
+    except ImportError:
+        if solver not in (None, "power"):
+            raise
+    else:
+        return solve_pagerank(corpus, damping_factor, solver or "power",
+                              TOLERANCE if threshold is None else threshold, callback)
+
     # Initialize pagerank values equal for all pages in corpus
     pagerank = {page: 1 / len(corpus) for page in corpus}
 
     total_pages = len(corpus)
-    threshold = 0.001
+    if threshold is None:
+        threshold = 0.001
+    start = time.perf_counter()
+    iteration = 0
 
     while True:
         new_pagerank = {page: 0 for page in corpus}
@@ -172,11 +178,19 @@ def iterate_pagerank(corpus, damping_factor):
                 if page in corpus[linking_page]:
                     # Update the PageRank based on linked pages
                     new_pagerank[page] += damping_factor * (pagerank[linking_page]) / len(corpus[linking_page])
+                elif not corpus[linking_page]:
+                    # A page without links is treated as linking to every page
+                    new_pagerank[page] += damping_factor * pagerank[linking_page] / total_pages
 
             # Check for convergence
             if abs(new_pagerank[page] - pagerank[page]) > threshold:
                 convergence = False
 
+        iteration += 1
+        if callback is not None:
+            residual = sum(abs(new_pagerank[page] - pagerank[page]) for page in corpus)
+            callback(iteration, residual, time.perf_counter() - start)
+
         if convergence:
             break
 
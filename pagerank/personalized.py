@@ -0,0 +1,105 @@
+import argparse
+
+import numpy as np
+
+from pagerank import DAMPING, crawl
+from sparse import MAX_ITERATIONS, TOLERANCE, TransitionMatrix
+
+
+def teleport_matrix(pages, seeds):
+    """
+    Returns an N x K matrix whose column `k` is the teleport distribution
+    for `seeds[k]`: either a set of pages, jumped to uniformly, or a
+    {page: weight} dict, normalized to sum to 1.
+    """
+    index = {page: i for i, page in enumerate(pages)}
+    teleports = np.zeros((len(pages), len(seeds)))
+    for k, seed in enumerate(seeds):
+        weights = seed if isinstance(seed, dict) else dict.fromkeys(seed, 1)
+        for page, weight in weights.items():
+            if page not in index:
+                raise ValueError(f"Unknown page: {page}")
+            teleports[index[page], k] = weight
+        total = teleports[:, k].sum()
+        if total <= 0:
+            raise ValueError("Every teleport distribution needs a positive weight")
+        teleports[:, k] /= total
+    return teleports
+
+
+def personalized_iteration(matrix, teleports, damping_factor,
+                           tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS):
+    """
+    Returns (ranks, iterations, residuals): an N x K matrix holding the
+    PageRank vector for each teleport distribution in the columns of
+    `teleports`, the iterations each took and the L1 change made by
+    its last one.
+
+    The surfer jumps, and leaves pages without links, according to the
+    column's distribution instead of uniformly. All columns still being
+    iterated share one sparse matrix-matrix product per iteration, and
+    a column stops once its change falls below `tolerance`.
+    """
+    ranks = teleports.copy()
+    iterations = np.zeros(teleports.shape[1], dtype=np.int64)
+    residuals = np.full(teleports.shape[1], np.inf)
+
+    # Columns still being iterated, kept side by side
+    active = np.arange(teleports.shape[1])
+    current, jumps = ranks, teleports
+    for iteration in range(1, max_iterations + 1):
+        dangling = current[matrix.dangling].sum(axis=0)
+        new_ranks = matrix.multiply(current)
+        new_ranks += jumps * dangling
+        new_ranks *= damping_factor
+        new_ranks += (1 - damping_factor) * jumps
+        residuals[active] = np.abs(new_ranks - current).sum(axis=0)
+        iterations[active] = iteration
+        current = new_ranks
+
+        # Set converged columns aside and only carry on with the rest
+        done = residuals[active] < tolerance
+        if done.any():
+            ranks[:, active[done]] = current[:, done]
+            active, current, jumps = active[~done], current[:, ~done], jumps[:, ~done]
+            if not len(active):
+                break
+    ranks[:, active] = current
+    return ranks, iterations, residuals
+
+
+def personalized_pagerank(corpus, damping_factor, seeds, tolerance=TOLERANCE):
+    """
+    Return a list with, for each seed set or {page: weight} dict in
+    `seeds`, PageRank values for each page when the surfer only jumps
+    to those pages; see teleport_matrix.
+    """
+    matrix = TransitionMatrix.from_corpus(corpus)
+    teleports = teleport_matrix(matrix.pages, seeds)
+    ranks, _, _ = personalized_iteration(matrix, teleports, damping_factor, tolerance)
+    return [matrix.ranks(column) for column in ranks.T]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PageRank personalized to sets of pages.")
+    parser.add_argument("corpus")
+    parser.add_argument("seeds", nargs="+", help="comma-separated pages to jump to, one set per argument")
+    parser.add_argument("--top", type=int, default=5, help="pages to show per set")
+    args = parser.parse_args()
+
+    matrix = TransitionMatrix.from_corpus(crawl(args.corpus))
+    seeds = [set(seed.split(",")) for seed in args.seeds]
+    try:
+        teleports = teleport_matrix(matrix.pages, seeds)
+    except ValueError as error:
+        parser.error(str(error))
+
+    ranks, iterations, _ = personalized_iteration(matrix, teleports, DAMPING)
+    for seed, column, count in zip(args.seeds, ranks.T, iterations):
+        print(f"Personalized PageRank for {seed} ({count} iterations)")
+        for page, rank in sorted(matrix.ranks(column).items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {page}: {rank:.4f}")
+
+
+if __name__ == "__main__":
+    main()
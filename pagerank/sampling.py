@@ -0,0 +1,275 @@
+import argparse
+import multiprocessing
+from bisect import bisect_left
+
+import numpy as np
+
+from pagerank import DAMPING, SAMPLES, crawl
+
+# Independent surfers advanced together by default
+WALKERS = 4096
+
+# Steps every surfer takes before its visits count. The start page is
+# forgotten at a rate of the damping factor per step, so after 50 steps
+# at 0.85 its influence is below 0.03%.
+BURN_IN = 50
+
+# Visits gathered before they are counted, so bincount runs once per batch
+BATCH = 1 << 20
+
+# Most batches a parallel run splits its budget into, and the fewest
+# whose spread gives a usable standard error
+BATCHES = 64
+MIN_BATCHES = 8
+
+# Normal quantile for the 95% confidence intervals used by `precision`
+Z95 = 1.96
+
+# Link table read by pool workers, inherited when they are forked
+shared_links = None
+
+
+class OutLinks():
+    """
+    Outgoing links of a corpus in CSR form: page `i` links to pages
+    `targets[offsets[i]:offsets[i + 1]]`.
+    """
+
+    def __init__(self, pages, offsets, targets):
+        self.pages = pages
+        self.offsets = offsets
+        self.targets = targets
+        self.degrees = np.diff(offsets)
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Builds the link table for a corpus as returned by `crawl`.
+        """
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        offsets = np.zeros(len(pages) + 1, dtype=np.int64)
+        np.cumsum([len(corpus[page]) for page in pages], out=offsets[1:])
+        targets = np.fromiter(
+            (index[link] for page in pages for link in sorted(corpus[page])),
+            dtype=np.int64, count=int(offsets[-1])
+        )
+        return cls(pages, offsets, targets)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def position(self, page):
+        """
+        Returns the index of `page`, or None if it is not in the table.
+        """
+        i = bisect_left(self.pages, page)
+        return i if i < len(self.pages) and self.pages[i] == page else None
+
+    def patch(self, corpus, diff):
+        """
+        Updates the table in place for `corpus`, which differs from the
+        corpus it was built for by the changes in `diff` (see
+        incremental.diff_corpus). Only re-linked pages are rewritten;
+        adding or removing pages renumbers every page, so the table is
+        built again from `corpus` instead.
+        """
+        if any(old_links is None or new_links is None for old_links, new_links in diff.values()):
+            rebuilt = OutLinks.from_corpus(corpus)
+            self.pages, self.offsets, self.targets, self.degrees = (
+                rebuilt.pages, rebuilt.offsets, rebuilt.targets, rebuilt.degrees
+            )
+            return
+
+        rows = sorted((self.position(page), page) for page in diff)
+        degrees = self.degrees.copy()
+        pieces = []
+        previous = 0
+        for i, page in rows:
+            pieces.append(self.targets[self.offsets[previous]:self.offsets[i]])
+            pieces.append(np.array(sorted(self.position(link) for link in diff[page][1]), dtype=np.int64))
+            degrees[i] = len(pieces[-1])
+            previous = i + 1
+        pieces.append(self.targets[self.offsets[previous]:])
+
+        offsets = np.zeros(len(self.pages) + 1, dtype=np.int64)
+        np.cumsum(degrees, out=offsets[1:])
+        self.offsets, self.targets, self.degrees = offsets, np.concatenate(pieces), degrees
+
+    def step(self, positions, damping_factor, rng):
+        """
+        Returns where surfers at `positions` go next: with probability
+        `damping_factor` along a link chosen uniformly, and otherwise,
+        or from a page without links, to a page chosen uniformly.
+        """
+        degrees = self.degrees[positions]
+        follow = (rng.random(len(positions)) < damping_factor) & (degrees > 0)
+        links = self.offsets[positions] + (rng.random(len(positions)) * degrees).astype(np.int64)
+        teleports = rng.integers(0, len(self.pages), len(positions))
+        if len(self.targets) == 0:
+            return teleports
+
+        # Surfers that teleport still index a valid link slot, which is ignored
+        links = np.minimum(links, len(self.targets) - 1)
+        return np.where(follow, self.targets[links], teleports)
+
+
+def walk(links, damping_factor, n, walkers=WALKERS, seed=None, burn_in=BURN_IN):
+    """
+    Returns an array of visit counts over `n` samples taken by
+    `walkers` surfers moving in lockstep, each starting on a page
+    chosen uniformly and taking `burn_in` uncounted steps first.
+    The same `seed` always gives the same counts.
+    """
+    rng = np.random.default_rng(seed)
+
+    # Keep the burn-in from costing more than the samples themselves
+    walkers = max(1, min(walkers, n // max(burn_in, 1)))
+    positions = rng.integers(0, len(links), walkers)
+    for _ in range(burn_in):
+        positions = links.step(positions, damping_factor, rng)
+
+    counts = np.zeros(len(links), dtype=np.int64)
+    batch = [positions]
+    batched = walkers
+    remaining = n - walkers
+    while remaining > 0:
+        positions = links.step(positions, damping_factor, rng)
+        if remaining < len(positions):
+            positions = positions[:remaining]
+        batch.append(positions)
+        batched += len(positions)
+        remaining -= len(positions)
+        if batched >= BATCH:
+            counts += np.bincount(np.concatenate(batch), minlength=len(links))
+            batch, batched = [], 0
+    if batch:
+        counts += np.bincount(np.concatenate(batch), minlength=len(links))
+    return counts
+
+
+def sample_walkers(corpus, damping_factor, n, walkers=WALKERS, seed=None):
+    """
+    Return PageRank values for each page as `sample_pagerank` does,
+    from `n` samples taken by many surfers at once.
+    """
+    if n < 1:
+        raise ValueError("Sampling needs at least one sample")
+    links = OutLinks.from_corpus(corpus)
+    counts = walk(links, damping_factor, n, walkers, seed)
+    return dict(zip(links.pages, (counts / n).tolist()))
+
+
+def share_links(links):
+    global shared_links
+    shared_links = links
+
+
+def count_batch(task):
+    """
+    Returns the visit counts for one (samples, damping_factor, walkers,
+    seed) batch over `shared_links`.
+    """
+    samples, damping_factor, walkers, seed = task
+    return walk(shared_links, damping_factor, samples, walkers, seed)
+
+
+def sample_parallel(corpus, damping_factor, n, processes=None, seed=None,
+                    precision=None, walkers=WALKERS):
+    """
+    Returns (ranks, errors, samples): PageRank values and their standard
+    errors for each page, and the number of samples they are based on.
+
+    Up to `n` samples are split into batches that differ in size by at
+    most one sample, each drawn from its own stream of a SeedSequence and counted by a pool of `processes`.
+    Standard errors come from the spread of the batch estimates. With a
+    `precision`, sampling stops once every page's 95% confidence interval
+    is within +/- `precision`.
+    """
+    if n < 1:
+        raise ValueError("Sampling needs at least one sample")
+    links = OutLinks.from_corpus(corpus)
+
+    # Every batch takes at least one sample, and the first ones one more
+    # each until the budget is used up
+    batches = min(BATCHES, max(MIN_BATCHES, n // 100000), n)
+    size, remainder = divmod(n, batches)
+    sizes = [size + (batch < remainder) for batch in range(batches)]
+    streams = np.random.SeedSequence(seed).spawn(batches)
+    tasks = [(samples, damping_factor, walkers, stream) for samples, stream in zip(sizes, streams)]
+
+    if processes == 1:
+        share_links(links)
+        return merge_batches(links, map(count_batch, tasks), sizes, precision)
+    if "fork" in multiprocessing.get_all_start_methods():
+        share_links(links)
+        context = multiprocessing.get_context("fork")
+        initializer, initargs = None, ()
+    else:
+        context = multiprocessing.get_context("spawn")
+        initializer, initargs = share_links, (links,)
+
+    # Batches are merged in order, so a seeded run stops at the same point
+    with context.Pool(processes, initializer=initializer, initargs=initargs) as pool:
+        return merge_batches(links, pool.imap(count_batch, tasks), sizes, precision)
+
+
+def merge_batches(links, results, sizes, precision=None):
+    """
+    Returns (ranks, errors, samples) from the visit counts of batches of
+    `sizes` samples each, stopping early once `precision` is reached.
+    """
+    total = np.zeros(len(links))
+    squares = np.zeros(len(links))
+    batches = samples = 0
+    for counts, size in zip(results, sizes):
+        estimate = counts / size
+        samples += size
+        total += estimate
+        squares += estimate * estimate
+        batches += 1
+        if precision is not None and batches >= MIN_BATCHES:
+            if Z95 * standard_errors(total, squares, batches).max() <= precision:
+                break
+
+    ranks = total / batches
+    errors = standard_errors(total, squares, batches)
+    return (
+        dict(zip(links.pages, ranks.tolist())),
+        dict(zip(links.pages, errors.tolist())),
+        samples,
+    )
+
+
+def standard_errors(total, squares, batches):
+    """
+    Returns the standard error of the mean of `batches` estimates
+    from their sum and sum of squares.
+    """
+    if batches < 2:
+        return np.full(len(total), np.inf)
+    mean = total / batches
+    variance = np.maximum(squares / batches - mean * mean, 0) * batches / (batches - 1)
+    return np.sqrt(variance / batches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate PageRank by random surfers.")
+    parser.add_argument("corpus")
+    parser.add_argument("--samples", type=int, default=SAMPLES, help="most samples to take")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--processes", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--precision", type=float,
+                        help="stop once every 95%% confidence interval is within +/- PRECISION")
+    args = parser.parse_args()
+
+    ranks, errors, samples = sample_parallel(
+        crawl(args.corpus), DAMPING, args.samples, args.processes, args.seed, args.precision
+    )
+    print(f"PageRank Results from Sampling (n = {samples})")
+    for page in sorted(ranks):
+        print(f"  {page}: {ranks[page]:.4f} +/- {Z95 * errors[page]:.4f}")
+
+
+if __name__ == "__main__":
+    main()
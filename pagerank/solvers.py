@@ -0,0 +1,219 @@
+import argparse
+import time
+from collections import deque
+
+import numpy as np
+
+from pagerank import DAMPING, crawl
+from sparse import MAX_ITERATIONS, TOLERANCE, TransitionMatrix, power_iteration
+
+# Gauss-Seidel updates the pages in this many runs of links per sweep,
+# each run seeing the ranks the runs before it produced
+GAUSS_SEIDEL_RUNS = 64
+
+# Iterations after which the adaptive solver updates frozen pages again
+ADAPTIVE_REFRESH = 8
+
+# Power iterations between two extrapolations
+EXTRAPOLATION_PERIOD = 10
+
+
+def gauss_seidel(matrix, damping_factor, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS,
+                 callback=None):
+    """
+    Returns (ranks, iterations, residual) as power_iteration does, but
+    sweeps over the pages in runs that each use the ranks already
+    updated earlier in the same sweep.
+    """
+    start = time.perf_counter()
+    n = len(matrix)
+    ranks = np.full(n, 1 / n)
+    runs = matrix.blocks(max(1, -(-len(matrix.sources) // GAUSS_SEIDEL_RUNS)))
+
+    # Pages nobody links to only ever receive the random jump
+    unlinked = np.setdiff1d(np.arange(n), matrix.linked)
+
+    residual = np.inf
+    iterations = 0
+    while residual >= tolerance and iterations < max_iterations:
+        previous = ranks.copy()
+        dangling = ranks[matrix.dangling].sum()
+        for rows, starts, first, last in runs:
+            contributions = ranks[matrix.sources[first:last]] * matrix.weights[first:last]
+            new_ranks = (1 - damping_factor) / n + damping_factor * (
+                np.add.reduceat(contributions, starts) + dangling / n
+            )
+
+            # Keep the rank held by pages without links current as well
+            dangling += (new_ranks - ranks[rows])[matrix.dangling[rows]].sum()
+            ranks[rows] = new_ranks
+        ranks[unlinked] = (1 - damping_factor) / n + damping_factor * dangling / n
+        ranks /= ranks.sum()
+
+        residual = np.abs(ranks - previous).sum()
+        iterations += 1
+        if callback is not None:
+            callback(iterations, residual, time.perf_counter() - start)
+    return ranks, iterations, residual
+
+
+def adaptive(matrix, damping_factor, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS,
+             callback=None):
+    """
+    Returns (ranks, iterations, residual) as power_iteration does, but
+    stops updating a page once its rank changes by less than its share
+    of `tolerance`, so later iterations only sum the links into pages
+    that are still moving.
+
+    A frozen page can start moving again as the pages linking to it
+    settle, so every page is updated again every ADAPTIVE_REFRESH
+    iterations and once the moving pages converge, and the solver only
+    stops when such a full update converges.
+    """
+    start = time.perf_counter()
+    n = len(matrix)
+    ranks = np.full(n, 1 / n)
+    everything = np.arange(n)
+    active = everything
+    threshold = tolerance / n
+
+    residual = np.inf
+    iterations = 0
+    while iterations < max_iterations:
+        dangling = ranks[matrix.dangling].sum()
+        if 2 * len(active) > n:
+            received = matrix.multiply(ranks)[active]
+        else:
+            received = matrix.multiply_rows(ranks, active)
+        new_ranks = (1 - damping_factor) / n + damping_factor * (received + dangling / n)
+        change = np.abs(new_ranks - ranks[active])
+        ranks[active] = new_ranks
+        residual = change.sum()
+        iterations += 1
+        if callback is not None:
+            callback(iterations, residual, time.perf_counter() - start)
+
+        if residual < tolerance and len(active) == n:
+            break
+        if residual < tolerance or iterations % ADAPTIVE_REFRESH == 0:
+            active = everything
+        else:
+            active = active[change >= threshold]
+    return ranks / ranks.sum(), iterations, residual
+
+
+def aitken(history):
+    """
+    Returns the Aitken delta-squared estimate of the limit of the last
+    three iterates in `history`, page by page.
+    """
+    x0, x1, x2 = history[-3], history[-2], history[-1]
+    step = x2 - x1
+    curvature = step - (x1 - x0)
+
+    # Pages whose steps are not shrinking geometrically keep their rank
+    safe = np.abs(curvature) > 1e-300
+    ranks = x2.copy()
+    ranks[safe] -= step[safe] ** 2 / curvature[safe]
+    return ranks
+
+
+def quadratic(history):
+    """
+    Returns the quadratic extrapolation of the last four iterates in
+    `history`: the combination of them that cancels the two largest
+    non-principal eigenvectors, fitted by least squares.
+    """
+    x0, x1, x2, x3 = history[-4], history[-3], history[-2], history[-1]
+    steps = np.column_stack([x1 - x0, x2 - x0])
+    gamma, _, _, _ = np.linalg.lstsq(steps, -(x3 - x0), rcond=None)
+    gamma1, gamma2 = gamma
+    return (gamma1 + gamma2 + 1) * x1 + (gamma2 + 1) * x2 + x3
+
+
+def extrapolated(extrapolate, needed):
+    """
+    Returns a solver that runs power iteration and, every
+    EXTRAPOLATION_PERIOD iterations, replaces the ranks with
+    `extrapolate` applied to the last `needed` iterates.
+    """
+    def solver(matrix, damping_factor, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS,
+               callback=None):
+        start = time.perf_counter()
+        ranks = np.full(len(matrix), 1 / len(matrix))
+        history = deque([ranks], maxlen=needed)
+
+        residual = np.inf
+        iterations = 0
+        while residual >= tolerance and iterations < max_iterations:
+            new_ranks = matrix.step(ranks, damping_factor)
+            residual = np.abs(new_ranks - ranks).sum()
+            ranks = new_ranks
+            history.append(ranks)
+            iterations += 1
+
+            if iterations % EXTRAPOLATION_PERIOD == 0 and len(history) == needed:
+                # Extrapolation can overshoot below zero on pages that barely move
+                ranks = np.maximum(extrapolate(history), 0)
+                ranks /= ranks.sum()
+                history.clear()
+                history.append(ranks)
+            if callback is not None:
+                callback(iterations, residual, time.perf_counter() - start)
+        return ranks, iterations, residual
+
+    return solver
+
+
+SOLVERS = {
+    "power": power_iteration,
+    "gauss-seidel": gauss_seidel,
+    "adaptive": adaptive,
+    "aitken": extrapolated(aitken, 3),
+    "quadratic": extrapolated(quadratic, 4),
+}
+
+
+def solve_pagerank(corpus, damping_factor, solver="power", tolerance=TOLERANCE, callback=None):
+    """
+    Return PageRank values for each page as `iterate_pagerank` does,
+    using the solver named `solver` from SOLVERS.
+    """
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver: {solver}")
+    matrix = TransitionMatrix.from_corpus(corpus)
+    ranks, _, _ = SOLVERS[solver](matrix, damping_factor, tolerance, callback=callback)
+    return matrix.ranks(ranks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PageRank solvers on a corpus.")
+    parser.add_argument("corpus")
+    parser.add_argument("--solver", choices=["all", *SOLVERS], default="all")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--trace", action="store_true", help="print every iteration")
+    args = parser.parse_args()
+
+    matrix = TransitionMatrix.from_corpus(crawl(args.corpus))
+    names = list(SOLVERS) if args.solver == "all" else [args.solver]
+
+    def trace(iteration, residual, elapsed):
+        print(f"  {iteration:4d}  {residual:.3e}  {elapsed:.4f}s")
+
+    reference = None
+    for name in names:
+        if args.trace:
+            print(name)
+        start = time.perf_counter()
+        ranks, iterations, residual = SOLVERS[name](
+            matrix, DAMPING, args.tolerance, callback=trace if args.trace else None
+        )
+        elapsed = time.perf_counter() - start
+        if reference is None:
+            reference = ranks
+        print(f"{name:>12}: {iterations:4d} iterations, residual {residual:.2e}, "
+              f"{elapsed:.4f}s, L1 from {names[0]} {np.abs(ranks - reference).sum():.2e}")
+
+
+if __name__ == "__main__":
+    main()
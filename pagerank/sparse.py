@@ -0,0 +1,192 @@
+import sys
+import time
+
+import numpy as np
+
+from pagerank import DAMPING, crawl
+
+# Stop once the L1 change between iterations falls below this
+TOLERANCE = 1e-8
+MAX_ITERATIONS = 1000
+
+# Most link contributions held at once when multiplying a matrix of ranks
+BLOCK = 1 << 18
+
+
+class TransitionMatrix():
+    """
+    Link structure of a corpus as a sparse matrix in CSR form.
+
+    Row `i` holds the pages linking to page `i`: their indices are
+    `sources[offsets[i]:offsets[i + 1]]` and each carries the weight
+    1 / (number of links on that page). Pages without links are marked
+    in `dangling` and treated as linking to every page.
+    """
+
+    def __init__(self, pages, offsets, sources, weights, dangling):
+        self.pages = pages
+        self.offsets = offsets
+        self.sources = sources
+        self.weights = weights
+        self.dangling = dangling
+
+        # reduceat cannot express empty rows, so only rows with links are summed
+        self.linked = np.flatnonzero(np.diff(offsets))
+        self.block_cache = (None, [])
+
+        # The weight each page gives every one of its links
+        self.shares = np.zeros(len(pages))
+        self.shares[sources] = weights
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Builds the matrix for a corpus as returned by `crawl`.
+        """
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        counts = np.array([len(corpus[page]) for page in pages], dtype=np.int64)
+
+        # Every link as a (source, target) pair, then grouped by target
+        sources = np.repeat(np.arange(len(pages), dtype=np.int64), counts)
+        targets = np.fromiter(
+            (index[link] for page in pages for link in corpus[page]),
+            dtype=np.int64, count=int(counts.sum())
+        )
+        order = np.argsort(targets, kind="stable")
+        sources = sources[order]
+        offsets = np.zeros(len(pages) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(targets, minlength=len(pages)), out=offsets[1:])
+
+        weights = 1 / counts[sources]
+        return cls(pages, offsets, sources, weights, counts == 0)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def multiply(self, ranks):
+        """
+        Returns the rank each page receives through links from pages
+        with `ranks`, leaving out dangling pages. `ranks` may also be
+        an N x K matrix holding K rank vectors as columns.
+        """
+        received = np.zeros(ranks.shape)
+        if ranks.ndim == 1:
+            if len(self.linked):
+                contributions = ranks[self.sources] * self.weights
+                received[self.linked] = np.add.reduceat(contributions, self.offsets[self.linked])
+            return received
+
+        # Every link from a page carries the same weight, so the ranks are
+        # weighted once per page rather than once per link. Contributions
+        # to whole rows are then summed a block of links at a time, so at
+        # most BLOCK of them are held at once however many columns there are.
+        shared = ranks * self.shares[:, None]
+        for rows, starts, first, last in self.blocks(max(1, BLOCK // ranks.shape[1])):
+            received[rows] = np.add.reduceat(shared[self.sources[first:last]], starts)
+        return received
+
+    def blocks(self, size):
+        """
+        Returns a list of (rows, starts, first, last) splitting the linked
+        rows into runs of about `size` links: the rows, where each starts
+        within the run, and the run's first and last link.
+        """
+        # Only the latest split is kept, as the width of a batch shrinks
+        # while its columns converge and each split is O(linked rows)
+        if self.block_cache[0] != size:
+            starts = self.offsets[self.linked]
+            cuts = np.unique(np.searchsorted(starts, np.arange(0, len(self.sources), size)))
+
+            # A row with more links than `size` can swallow the last cuts
+            cuts = cuts[cuts < len(self.linked)]
+            bounds = np.append(cuts, len(self.linked))
+            self.block_cache = (size, [
+                (
+                    self.linked[a:b],
+                    starts[a:b] - starts[a],
+                    starts[a],
+                    self.offsets[self.linked[b - 1] + 1],
+                )
+                for a, b in zip(bounds[:-1], bounds[1:])
+            ])
+        return self.block_cache[1]
+
+    def multiply_rows(self, ranks, rows):
+        """
+        Returns `multiply(ranks)[rows]`, summing only the links into `rows`.
+        """
+        starts = self.offsets[rows]
+        counts = self.offsets[rows + 1] - starts
+        received = np.zeros(len(rows))
+        linked = np.flatnonzero(counts)
+        if len(linked):
+            # Index of each link: its row's start plus its position within the row
+            ends = np.cumsum(counts)
+            links = np.repeat(starts - ends + counts, counts) + np.arange(ends[-1])
+            contributions = ranks[self.sources[links]] * self.weights[links]
+            received[linked] = np.add.reduceat(contributions, (ends - counts)[linked])
+        return received
+
+    def step(self, ranks, damping_factor):
+        """
+        Returns the ranks after one application of the PageRank formula.
+        """
+        n = len(self.pages)
+        dangling = ranks[self.dangling].sum() / n
+        return (1 - damping_factor) / n + damping_factor * (self.multiply(ranks) + dangling)
+
+    def ranks(self, vector):
+        """
+        Returns a {page: rank} dict for a rank vector.
+        """
+        return dict(zip(self.pages, vector.tolist()))
+
+
+def power_iteration(matrix, damping_factor, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS,
+                    callback=None):
+    """
+    Returns (ranks, iterations, residual): the rank vector found by
+    repeated sparse matrix-vector products starting from a uniform
+    vector, the number of products taken, and the L1 change made by
+    the last one.
+
+    If given, `callback(iteration, residual, elapsed)` is called after
+    every product with the seconds elapsed since the start.
+    """
+    start = time.perf_counter()
+    ranks = np.full(len(matrix), 1 / len(matrix))
+    residual = np.inf
+    iterations = 0
+    while residual >= tolerance and iterations < max_iterations:
+        new_ranks = matrix.step(ranks, damping_factor)
+        residual = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        iterations += 1
+        if callback is not None:
+            callback(iterations, residual, time.perf_counter() - start)
+    return ranks, iterations, residual
+
+
+def sparse_pagerank(corpus, damping_factor, tolerance=TOLERANCE):
+    """
+    Return PageRank values for each page as `iterate_pagerank` does,
+    using power iteration over a sparse transition matrix.
+    """
+    matrix = TransitionMatrix.from_corpus(corpus)
+    ranks, _, _ = power_iteration(matrix, damping_factor, tolerance)
+    return matrix.ranks(ranks)
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python sparse.py corpus")
+    matrix = TransitionMatrix.from_corpus(crawl(sys.argv[1]))
+    ranks, iterations, residual = power_iteration(matrix, DAMPING)
+    print(f"PageRank Results from Power Iteration ({iterations} iterations, residual {residual:.2e})")
+    for page, rank in sorted(matrix.ranks(ranks).items()):
+        print(f"  {page}: {rank:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import argparse
+import os
+import random
+from array import array
+
+# Page layout matching the bundled corpora, which crawl parses
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+    <head>
+        <title>{title}</title>
+    </head>
+    <body>
+        <h1>{title}</h1>
+
+        <div>Links:</div>
+        <ul>
+{links}
+        </ul>
+    </body>
+</html>
+"""
+LINK = '            <li><a href="{page}">{title}</a></li>'
+
+
+def page_name(page):
+    return f"{page}.html"
+
+
+def power_law(rng, exponent, minimum, maximum):
+    """
+    Returns an integer drawn from a Pareto distribution with the given
+    tail `exponent`, clipped to [minimum, maximum].
+    """
+    return min(int(minimum * rng.paretovariate(exponent - 1)), maximum)
+
+
+def generate_links(pages, exponent=2.1, dangling=0.1, copy=0.7, cycles=0.1, seed=0):
+    """
+    Yields, for each of `pages` pages in turn, the sorted list of the
+    page numbers it links to.
+
+    Pages arrive one at a time, and a `dangling` fraction of them has no
+    links. The rest have a power-law number of links. Each link copies
+    the target of a random earlier link with probability `copy`, which
+    is preferential attachment by in-degree. With probability `cycles`
+    it goes to any page at all, which closes cycles. Otherwise it goes
+    to an earlier page chosen uniformly.
+    """
+    rng = random.Random(seed)
+
+    # Target of every link so far, four bytes each
+    targets = array("i")
+    for page in range(pages):
+        links = set()
+        if page and rng.random() >= dangling:
+            for _ in range(power_law(rng, exponent, 1, min(pages - 1, 1000))):
+                draw = rng.random()
+                if draw < cycles:
+                    links.add(rng.randrange(pages))
+                elif draw < cycles + copy and targets:
+                    links.add(targets[rng.randrange(len(targets))])
+                else:
+                    links.add(rng.randrange(page))
+            links.discard(page)
+        targets.extend(links)
+        yield sorted(links)
+
+
+def write_html(directory, pages, **options):
+    """
+    Writes a corpus of `pages` HTML pages to `directory`, linked as
+    generate_links describes.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for page, links in enumerate(generate_links(pages, **options)):
+        with open(os.path.join(directory, page_name(page)), "w", encoding="utf-8") as f:
+            f.write(PAGE.format(
+                title=f"Page {page}",
+                links="\n".join(LINK.format(page=page_name(link), title=f"Page {link}") for link in links),
+            ))
+
+
+def write_edges(path, pages, **options):
+    """
+    Writes an edge file (see ondisk.py) for `pages` pages, linked as
+    generate_links describes.
+    """
+    from ondisk import write_graph
+
+    names = [page_name(page) for page in range(pages)]
+    write_graph(path, names, (
+        [names[link] for link in links] for links in generate_links(pages, **options)
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic web graph.")
+    parser.add_argument("output", help="directory for HTML pages, or a file with --edges")
+    parser.add_argument("--pages", type=int, default=10 ** 4, help="number of pages (10^2 to 10^6)")
+    parser.add_argument("--edges", action="store_true",
+                        help="write an ondisk.py edge file instead of HTML pages")
+    parser.add_argument("--exponent", type=float, default=2.1,
+                        help="power-law exponent for the number of links per page")
+    parser.add_argument("--dangling", type=float, default=0.1, help="fraction of pages without links")
+    parser.add_argument("--copy", type=float, default=0.7,
+                        help="chance a link copies an earlier link's target")
+    parser.add_argument("--cycles", type=float, default=0.1,
+                        help="chance a link goes to any page, not only earlier ones")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    options = dict(exponent=args.exponent, dangling=args.dangling, copy=args.copy,
+                   cycles=args.cycles, seed=args.seed)
+    if args.edges:
+        write_edges(args.output, args.pages, **options)
+    else:
+        write_html(args.output, args.pages, **options)
+
+
+if __name__ == "__main__":
+    main()
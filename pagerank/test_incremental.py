@@ -0,0 +1,52 @@
+import numpy as np
+
+from incremental import diff_corpus, update_pagerank
+from sampling import OutLinks
+from sparse import sparse_pagerank
+from synthetic import generate_links, page_name
+
+
+def synthetic_corpus(pages):
+    """
+    Returns a corpus of `pages` pages linked as synthetic.py links them.
+    """
+    return {page_name(page): {page_name(link) for link in links}
+            for page, links in enumerate(generate_links(pages))}
+
+
+def assert_same_links(links, corpus):
+    """
+    Checks that `links` holds the same table as one built from `corpus`.
+    """
+    expected = OutLinks.from_corpus(corpus)
+    assert links.pages == expected.pages
+    assert np.array_equal(links.offsets, expected.offsets)
+    assert np.array_equal(links.targets, expected.targets)
+    assert np.array_equal(links.degrees, expected.degrees)
+
+
+def test_update_reuses_patched_links():
+    old = synthetic_corpus(500)
+    ranks = sparse_pagerank(old, 0.85)
+    links = OutLinks.from_corpus(old)
+
+    # Re-link pages, including emptying one and filling a dangling one
+    new = dict(old)
+    new["3.html"] = {"0.html", "499.html"}
+    new["10.html"] = set()
+    dangling = next(page for page in sorted(old) if not old[page])
+    new[dangling] = {"3.html"}
+    diff = diff_corpus(old, new)
+
+    updated = update_pagerank(new, ranks, diff, 0.85, links=links)
+    assert_same_links(links, new)
+    expected = sparse_pagerank(new, 0.85)
+    assert sum(abs(updated[page] - expected[page]) for page in new) < 1e-6
+
+    # Adding a page renumbers the rest, so the table is rebuilt in place
+    newer = dict(new)
+    newer["new.html"] = {"3.html"}
+    updated = update_pagerank(newer, updated, diff_corpus(new, newer), 0.85, links=links)
+    assert_same_links(links, newer)
+    expected = sparse_pagerank(newer, 0.85)
+    assert sum(abs(updated[page] - expected[page]) for page in newer) < 1e-6
@@ -0,0 +1,23 @@
+import os
+
+import pytest
+
+import crawler
+from pagerank import sample_pagerank
+from sampling import sample_parallel
+
+CORPUS = crawler.crawl(os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus0"), cache=False)
+
+
+@pytest.mark.parametrize("options", [{}, {"walkers": 16}, {"processes": 1}])
+def test_sample_pagerank_needs_a_sample(options):
+    for n in (0, -1):
+        with pytest.raises(ValueError):
+            sample_pagerank(CORPUS, 0.85, n, **options)
+
+
+@pytest.mark.parametrize("n", [1, 5, 9, 1001])
+def test_parallel_sampling_uses_whole_budget(n):
+    ranks, _, samples = sample_parallel(CORPUS, 0.85, n, processes=1, seed=0)
+    assert samples == n
+    assert sum(ranks.values()) == pytest.approx(1)
@@ -0,0 +1,47 @@
+import numpy as np
+
+from pagerank import iterate_pagerank
+from personalized import personalized_pagerank
+from sparse import TransitionMatrix, sparse_pagerank
+
+
+def hub_corpus(pages):
+    """
+    Returns a corpus of `pages` pages that all link to one hub page,
+    which sorts last and so is the last linked row.
+    """
+    corpus = {f"p{i:04d}.html": {"zzz.html"} for i in range(pages)}
+    corpus["zzz.html"] = set()
+    return corpus
+
+
+def test_blocks_with_oversized_last_row():
+    matrix = TransitionMatrix.from_corpus(hub_corpus(2000))
+    for size in (1, 7, 1999, 2000, 4096):
+        blocks = matrix.blocks(size)
+        assert sum(len(rows) for rows, _, _, _ in blocks) == len(matrix.linked)
+        assert blocks[-1][3] == len(matrix.sources)
+
+
+def test_personalized_pagerank_with_hub():
+    corpus = hub_corpus(2000)
+    ranks = personalized_pagerank(corpus, 0.85, [set(corpus)] * 200)
+    expected = sparse_pagerank(corpus, 0.85)
+    assert len(ranks) == 200
+    for page in corpus:
+        assert np.isclose(ranks[-1][page], expected[page])
+
+
+def test_blocks_keeps_only_latest_split():
+    matrix = TransitionMatrix.from_corpus(hub_corpus(100))
+    matrix.blocks(3)
+    matrix.blocks(5)
+    assert matrix.block_cache[0] == 5
+
+
+def test_gauss_seidel_with_hub():
+    corpus = hub_corpus(199)
+    ranks = iterate_pagerank(corpus, 0.85, solver="gauss-seidel")
+    expected = sparse_pagerank(corpus, 0.85)
+    for page in corpus:
+        assert np.isclose(ranks[page], expected[page])